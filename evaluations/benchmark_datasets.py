@@ -0,0 +1,57 @@
+import argparse
+import os
+import time
+import tracemalloc
+
+import pandas as pd
+
+from evaluations.datasets import load
+
+# Columns run_eval / run_retrieval_eval actually read from each dataset
+NEEDED = {
+    "chats": ["id", "query"],
+    "sources": ["section", "project_message_id", "distance"],
+    "groundtruth": ["query", "enlaye_response", "gpt_response"],
+}
+
+
+def measure(read, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        df = read()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    df = read()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak, df.memory_usage(deep=True).sum()
+
+
+def run(csv_dir, parquet_dir, repeats):
+    # tracemalloc sees Python allocations only; Arrow's own buffers during a Parquet read are not
+    # counted in "Peak alloc", but the resulting DataFrame size is comparable across rows
+    print("| Dataset | Read | Load (ms) | Peak alloc (MB) | DataFrame (MB) |")
+    print("|---|---|---|---|---|")
+    for name, columns in NEEDED.items():
+        csv_path = os.path.join(csv_dir, name + ".csv")
+        parquet_path = os.path.join(parquet_dir, name + ".parquet")
+        variants = [
+            ("CSV, all columns", lambda: pd.read_csv(csv_path)),
+            ("CSV, needed columns", lambda: load(csv_path, columns)),
+            ("Parquet, needed columns", lambda: load(parquet_path, columns)),
+        ]
+        for label, read in variants:
+            seconds, peak, frame = measure(read, repeats)
+            print(f"| {name} | {label} | {seconds * 1000:.1f} | {peak / 1e6:.2f} | {frame / 1e6:.2f} |")
+
+
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Load time and memory of the evaluation datasets, CSV vs Parquet")
+    parser.add_argument("--csv_dir", default=here)
+    parser.add_argument("--parquet_dir", default=here, help="where `python -m evaluations.datasets` wrote the Parquet files")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    run(args.csv_dir, args.parquet_dir, args.repeats)
@@ -0,0 +1,171 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+N_RESAMPLES = 10000
+ALPHA = 0.05
+# Resamples are drawn as (resamples, n) index matrices, in blocks of at most this many cells so
+# memory stays bounded on large evaluation sets
+MAX_CELLS = 10_000_000
+
+
+def block_rows(n, n_resamples):
+    per_block = max(1, MAX_CELLS // max(n, 1))
+    for start in range(0, n_resamples, per_block):
+        yield min(per_block, n_resamples - start)
+
+
+def resample_blocks(n, n_resamples, rng):
+    for rows in block_rows(n, n_resamples):
+        # Row b holds the item indices drawn for resample b
+        yield rng.integers(0, n, size=(rows, n), dtype=np.int32)
+
+
+def bootstrap(stat, arrays, n_resamples=N_RESAMPLES, seed=0):
+    # stat(*resampled_arrays) must reduce along the last axis, returning an array or a dict of them
+    rng = np.random.default_rng(seed)
+    parts = [stat(*(a[idx] for a in arrays)) for idx in resample_blocks(len(arrays[0]), n_resamples, rng)]
+    if isinstance(parts[0], dict):
+        return {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+    return np.concatenate(parts)
+
+
+def interval(samples, alpha=ALPHA):
+    samples = samples[~np.isnan(samples)]
+    if len(samples) == 0:
+        return np.nan, np.nan
+    low, high = np.percentile(samples, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+    return low, high
+
+
+def mean(values):
+    return values.mean(axis=-1)
+
+
+def bootstrap_mean(values, n_resamples=N_RESAMPLES, alpha=ALPHA, seed=0) -> dict:
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return {"n": 0, "estimate": np.nan, "low": np.nan, "high": np.nan}
+    low, high = interval(bootstrap(mean, [values], n_resamples, seed), alpha)
+    return {"n": len(values), "estimate": values.mean(), "low": low, "high": high}
+
+
+def classification_metrics(truth, pred):
+    # Works on a single label vector or on a (resamples, n) matrix of them, row-wise
+    truth, pred = np.asarray(truth, dtype=bool), np.asarray(pred, dtype=bool)
+    tp = (truth & pred).sum(axis=-1)
+    fp = (~truth & pred).sum(axis=-1)
+    fn = (truth & ~pred).sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "accuracy": (truth == pred).mean(axis=-1),
+            "precision": tp / (tp + fp),
+            "recall": tp / (tp + fn),
+        }
+
+
+def bootstrap_classification(truth, pred, n_resamples=N_RESAMPLES, alpha=ALPHA, seed=0) -> dict:
+    truth, pred = np.asarray(truth), np.asarray(pred)
+    point = classification_metrics(truth, pred)
+    samples = bootstrap(classification_metrics, [truth, pred], n_resamples, seed)
+    out = {}
+    for name, value in point.items():
+        low, high = interval(samples[name], alpha)
+        out[name] = {"n": len(truth), "estimate": float(value), "low": low, "high": high}
+    return out
+
+
+def paired_test(a, b, n_resamples=N_RESAMPLES, alpha=ALPHA, seed=0) -> dict:
+    # Per-item scores of two systems on the same items. CI of mean(a - b) by bootstrap; the
+    # p-value is a sign-flip permutation test on the paired differences (two-sided).
+    diff = np.asarray(a, dtype=float) - np.asarray(b, dtype=float)
+    diff = diff[~np.isnan(diff)]
+    n = len(diff)
+    if n == 0:
+        return {"n": 0, "difference": np.nan, "low": np.nan, "high": np.nan, "p_value": np.nan}
+    low, high = interval(bootstrap(mean, [diff], n_resamples, seed), alpha)
+    observed = diff.mean()
+    rng = np.random.default_rng(seed + 1)
+    extreme = 0
+    for rows in block_rows(n, n_resamples):
+        signs = rng.choice(np.array([-1.0, 1.0]), size=(rows, n))
+        extreme += np.sum(np.abs((signs * diff).mean(axis=1)) >= abs(observed) - 1e-12)
+    p = (extreme + 1) / (n_resamples + 1)
+    return {"n": n, "difference": observed, "low": low, "high": high, "p_value": p}
+
+
+def paired_classification_test(truth, pred_a, pred_b, n_resamples=N_RESAMPLES, alpha=ALPHA, seed=0) -> dict:
+    # Difference in each metric (a - b) over the same resampled items; the p-value is the
+    # two-sided bootstrap probability that the difference has the other sign
+    truth, pred_a, pred_b = np.asarray(truth), np.asarray(pred_a), np.asarray(pred_b)
+    point_a, point_b = classification_metrics(truth, pred_a), classification_metrics(truth, pred_b)
+
+    def delta(t, a, b):
+        ma, mb = classification_metrics(t, a), classification_metrics(t, b)
+        return {name: ma[name] - mb[name] for name in ma}
+
+    samples = bootstrap(delta, [truth, pred_a, pred_b], n_resamples, seed)
+    out = {}
+    for name in point_a:
+        d = samples[name][~np.isnan(samples[name])]
+        low, high = interval(d, alpha)
+        p = min(1.0, 2 * min((d <= 0).mean(), (d >= 0).mean())) if len(d) else np.nan
+        out[name] = {"n": len(truth), "difference": float(point_a[name] - point_b[name]),
+                     "low": low, "high": high, "p_value": p}
+    return out
+
+
+def format_ci(name, r, alpha=ALPHA):
+    return f"{name:<12} {r['estimate']:.3f}  [{r['low']:.3f}, {r['high']:.3f}]  ({1 - alpha:.0%} CI, n={r['n']})"
+
+
+def format_paired(name, r):
+    return (f"{name:<12} {r['difference']:+.3f}  [{r['low']:+.3f}, {r['high']:+.3f}]  "
+            f"p={r['p_value']:.4f}  (n={r['n']})")
+
+
+def eval_scores(df: pd.DataFrame) -> pd.DataFrame:
+    # Per-row numeric scores from a run_eval output
+    return pd.DataFrame({
+        "query": df["query"],
+        "cosine": pd.to_numeric(df["cosine_similarity"], errors="coerce"),
+        "all_matched": (df["section_match"] == "ALL_MATCHED").astype(float),
+        "any_match": df["section_match"].isin(["ALL_MATCHED", "PARTIAL_MATCHED"]).astype(float),
+    })
+
+
+def summarize_eval(df: pd.DataFrame, n_resamples=N_RESAMPLES) -> pd.DataFrame:
+    scores = eval_scores(df)
+    rows = []
+    for metric in ("cosine", "all_matched", "any_match"):
+        r = bootstrap_mean(scores[metric], n_resamples)
+        rows.append({"metric": metric, **r})
+        print(format_ci(metric, r))
+    return pd.DataFrame(rows)
+
+
+def compare_evals(df: pd.DataFrame, baseline: pd.DataFrame, n_resamples=N_RESAMPLES) -> pd.DataFrame:
+    # Paired on query: only rows present in both runs are compared
+    merged = eval_scores(df).merge(eval_scores(baseline), on="query", suffixes=("", "_baseline"))
+    rows = []
+    for metric in ("cosine", "all_matched", "any_match"):
+        r = paired_test(merged[metric], merged[metric + "_baseline"], n_resamples)
+        rows.append({"metric": metric, **r})
+        print(format_paired(metric, r))
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bootstrap CIs for a run_eval output, optionally paired against a baseline run")
+    parser.add_argument("eval_csv")
+    parser.add_argument("--baseline_csv", default=None)
+    parser.add_argument("--resamples", type=int, default=N_RESAMPLES)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.eval_csv)
+    summarize_eval(df, args.resamples)
+    if args.baseline_csv:
+        print(f"\nDifference vs {args.baseline_csv} (this run - baseline):")
+        compare_evals(df, pd.read_csv(args.baseline_csv), args.resamples)
@@ -0,0 +1,104 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Columns holding chat message ids. They share one dictionary across files, so joins between
+# chats and sources compare small integer codes instead of UUID strings.
+MESSAGE_ID_COLUMNS = {
+    "chats": ["id"],
+    "sources": ["project_message_id"],
+    "enriched_results": ["message_id"],
+}
+# Other low-cardinality strings worth dictionary-encoding per file
+CATEGORY_COLUMNS = {
+    "sources": ["section"],
+    "enriched_results": ["section_match"],
+}
+EMBEDDING_SUFFIX = "_embedding"
+
+
+def dataset_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def load(path, columns=None):
+    # Reads a dataset from .csv or .parquet, only materializing `columns`. Parquet keeps the
+    # dictionary-encoded columns as pandas categoricals.
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+def parquet_columns(path):
+    import pyarrow.parquet as pq
+    return pq.read_schema(path).names
+
+
+def embeddings(df, column):
+    # Cached embedding column -> (rows, dim) float32 matrix
+    return np.stack(df[column + EMBEDDING_SUFFIX].to_numpy()).astype(np.float32)
+
+
+def message_id_vocabulary(frames):
+    ids = [frames[name][col] for name, cols in MESSAGE_ID_COLUMNS.items() if name in frames for col in cols]
+    return pd.Index(pd.concat(ids, ignore_index=True).dropna().unique()).sort_values()
+
+
+def encode_columns(name, df, vocabulary):
+    for col in MESSAGE_ID_COLUMNS.get(name, []):
+        df[col] = pd.Categorical(df[col], categories=vocabulary)
+    for col in CATEGORY_COLUMNS.get(name, []):
+        df[col] = df[col].astype("category")
+    return df
+
+
+def add_embeddings(df, columns, batch_size=64):
+    from evaluations.evaluate_responses import embedding_model
+    model = embedding_model()
+    for col in columns:
+        texts = df[col].fillna("").astype(str).tolist()
+        vecs = model.encode(texts, batch_size=batch_size, convert_to_numpy=True).astype(np.float32)
+        df[col + EMBEDDING_SUFFIX] = list(vecs)
+    return df
+
+
+def convert(csv_files, out_dir, embed=None):
+    # Converts the CSV exports together so every message-id column gets the same dictionary
+    embed = embed or {}
+    frames = {dataset_name(p): pd.read_csv(p) for p in csv_files}
+    vocabulary = message_id_vocabulary(frames)
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for name, df in frames.items():
+        df = encode_columns(name, df, vocabulary)
+        if embed.get(name):
+            df = add_embeddings(df, embed[name])
+        out = os.path.join(out_dir, name + ".parquet")
+        df.to_parquet(out, index=False, compression="zstd")
+        written.append(out)
+        print(f"{name}: {len(df)} rows -> {out} ({os.path.getsize(out) / 1e6:.2f} MB)")
+    return written
+
+
+def parse_embed(specs):
+    # ["groundtruth:enlaye_response,gpt_response"] -> {"groundtruth": ["enlaye_response", "gpt_response"]}
+    embed = {}
+    for spec in specs or []:
+        name, cols = spec.split(":", 1)
+        embed.setdefault(name, []).extend(c for c in cols.split(",") if c)
+    return embed
+
+
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Convert the evaluation CSVs to Parquet")
+    parser.add_argument("csv_files", nargs="*", default=[
+        os.path.join(here, f) for f in ("chats.csv", "sources.csv", "groundtruth.csv")])
+    parser.add_argument("--out_dir", default=here)
+    parser.add_argument("--embed", nargs="*", default=[],
+                        help="cache MiniLM embeddings, e.g. groundtruth:enlaye_response,gpt_response")
+    args = parser.parse_args()
+
+    convert(args.csv_files, args.out_dir, parse_embed(args.embed))
@@ -1,13 +1,19 @@
 import pandas as pd
 import argparse
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
-import torch
 from difflib import SequenceMatcher
+from functools import lru_cache
+import numpy as np
 import re
 
-# Load embedding model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+from evaluations.bootstrap_stats import compare_evals, summarize_eval
+from evaluations.datasets import EMBEDDING_SUFFIX, load, parquet_columns
+
+# Load embedding model on first use, so importing this module (e.g. for get_top_sections)
+# does not pull in sentence-transformers and torch
+@lru_cache(maxsize=None)
+def embedding_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer("all-MiniLM-L6-v2")
 
 def extract_section_number(text):
     match = re.match(r"^\s*(\d+[a-zA-Z]?(\.\d+)*)(\s|$)", str(text))
@@ -22,10 +28,14 @@ def get_top_sections(sources_df, msg_id, top_k=3):
     top_sections = subset.head(top_k)['section'].tolist()
     return [extract_section_number(clean_section(s)) for s in top_sections if extract_section_number(clean_section(s))]
 
-def run_eval(chats_file, sources_file, gt_file, ai_col, gt_col, out_csv):
-    chats_df = pd.read_csv(chats_file)
-    sources_df = pd.read_csv(sources_file)
-    gt_df = pd.read_csv(gt_file)
+def run_eval(chats_file, sources_file, gt_file, ai_col, gt_col, out_csv, baseline_csv=None):
+    # Either .csv or .parquet (see datasets.py); only the columns used below are read
+    chats_df = load(chats_file, ["id", "query"])
+    sources_df = load(sources_file, ["section", "project_message_id", "distance"])
+    gt_columns = ["query", ai_col, gt_col]
+    embedded = [c + EMBEDDING_SUFFIX for c in (ai_col, gt_col)]
+    cached_embeddings = gt_file.endswith(".parquet") and set(embedded) <= set(parquet_columns(gt_file))
+    gt_df = load(gt_file, gt_columns + embedded if cached_embeddings else gt_columns)
 
     results = []
     for _, row in gt_df.iterrows():
@@ -51,7 +61,12 @@ def run_eval(chats_file, sources_file, gt_file, ai_col, gt_col, out_csv):
         # COSINE SIMILARITY
         if pd.isna(ai_resp) or pd.isna(gt_resp):
             cos_sim = None
+        elif cached_embeddings:
+            emb1, emb2 = row[embedded[0]], row[embedded[1]]
+            cos_sim = float(np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2)))
         else:
+            from sklearn.metrics.pairwise import cosine_similarity
+            model = embedding_model()
             emb1 = model.encode([ai_resp], convert_to_tensor=True).cpu()
             emb2 = model.encode([gt_resp], convert_to_tensor=True).cpu()
             cos_sim = float(cosine_similarity(emb1, emb2)[0][0])
@@ -64,7 +79,13 @@ def run_eval(chats_file, sources_file, gt_file, ai_col, gt_col, out_csv):
             "cosine_similarity": cos_sim
         })
 
-    pd.DataFrame(results).to_csv(out_csv, index=False)
+    out = pd.DataFrame(results)
+    out.to_csv(out_csv, index=False)
+    summarize_eval(out)
+    if baseline_csv:
+        print(f"\nDifference vs {baseline_csv} (this run - baseline):")
+        compare_evals(out, pd.read_csv(baseline_csv))
+    return out
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -74,6 +95,7 @@ if __name__ == "__main__":
     parser.add_argument("--ai_column", required=True)
     parser.add_argument("--gt_column", required=True)
     parser.add_argument("--out_csv", default="eval_output.csv")
+    parser.add_argument("--baseline_csv", default=None, help="earlier run_eval output to test this run against")
     args = parser.parse_args()
 
     run_eval(
@@ -82,5 +104,6 @@ if __name__ == "__main__":
         gt_file=args.gt_file,
         ai_col=args.ai_column,
         gt_col=args.gt_column,
-        out_csv=args.out_csv
+        out_csv=args.out_csv,
+        baseline_csv=args.baseline_csv
     )
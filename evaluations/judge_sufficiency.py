@@ -0,0 +1,154 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from query_preprocessing import fullAgentImplementation
+from query_preprocessing.fullAgentImplementation import missingInfo
+
+
+class RateLimiter:
+    # Spaces calls at least 1/rate seconds apart across all worker threads; rate <= 0 disables it
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            at = max(self.next_at, now)
+            self.next_at = at + self.interval
+        time.sleep(max(at - now, 0))
+
+
+def content_hash(model, query, response):
+    # The judge prompt is part of the key, so editing missingInfoSys re-judges everything
+    payload = json.dumps([model, fullAgentImplementation.missingInfoSys, query, response], ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def load_cache(path):
+    cache = {}
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    cache[entry["content_hash"]] = entry
+    return cache
+
+
+def stream_rows(chats_file, chunksize):
+    for chunk in pd.read_csv(chats_file, chunksize=chunksize, usecols=["id", "query", "response"]):
+        yield from chunk.itertuples(index=False)
+
+
+def judge(model, row, key, limiter):
+    limiter.acquire()
+    start = time.perf_counter()
+    try:
+        result = missingInfo(model, row.query, row.response)
+        error = None
+    except Exception as e:
+        result, error = {"sufficient": None, "missingInfo": None}, repr(e)
+    return {
+        "content_hash": key,
+        "sufficient": result["sufficient"],
+        "missing_info": result["missingInfo"] or [],
+        "latency_s": round(time.perf_counter() - start, 3),
+        "error": error,
+    }
+
+
+def run_judging(chats_file, model, out_file, cache_file, concurrency, rate, chunksize=256, limit=None):
+    cache = load_cache(cache_file)
+    limiter = RateLimiter(rate)
+    cache_lock = threading.Lock()
+    records, pending = [], {}
+    counts = {"rows": 0, "cached": 0, "judged": 0, "errors": 0}
+    start = time.perf_counter()
+
+    def finish(future):
+        row, key, index = pending.pop(future)
+        result = future.result()
+        if result["error"]:
+            counts["errors"] += 1
+        else:
+            counts["judged"] += 1
+            # Appended as soon as it is known, so an interrupted run keeps what it finished
+            with cache_lock, open(cache_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+            cache[key] = result
+        records.append({"index": index, "id": row.id, **result, "cached": False})
+        done = counts["judged"] + counts["errors"]
+        if done % 25 == 0:
+            print(f"{done} judged, {counts['cached']} cached, {done / (time.perf_counter() - start):.2f} rows/s")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for row in stream_rows(chats_file, chunksize):
+            if limit is not None and counts["rows"] >= limit:
+                break
+            index = counts["rows"]
+            counts["rows"] += 1
+            key = content_hash(model, row.query, row.response)
+            if key in cache:
+                counts["cached"] += 1
+                records.append({"index": index, "id": row.id, **cache[key], "cached": True})
+                continue
+            # Bounded in-flight work, so rows are read only as fast as they are judged
+            while len(pending) >= 2 * concurrency:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(future)
+            pending[pool.submit(judge, model, row, key, limiter)] = (row, key, index)
+        for future in list(pending):
+            future.result()
+            finish(future)
+
+    # Judged rows finish out of order; input order keeps re-runs diffable
+    records.sort(key=lambda r: r["index"])
+    out = pd.DataFrame.from_records(records, columns=[
+        "id", "content_hash", "sufficient", "missing_info", "latency_s", "cached", "error"])
+    out["sufficient"] = out["sufficient"].astype("boolean")
+    out["n_missing"] = out["missing_info"].map(len)
+    if out_file.endswith(".parquet"):
+        out.to_parquet(out_file, index=False)
+    else:
+        out.assign(missing_info=out["missing_info"].map(json.dumps)).to_csv(out_file, index=False)
+
+    elapsed = time.perf_counter() - start
+    print(f"{counts['rows']} rows: {counts['judged']} judged, {counts['cached']} from cache, "
+          f"{counts['errors']} errors in {elapsed:.1f}s -> {out_file}")
+    print(f"insufficient: {int((out['sufficient'] == False).sum())}, "
+          f"median judge latency: {out.loc[~out['cached'], 'latency_s'].median():.2f}s")
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats_file", default=os.path.join(os.path.dirname(__file__), "chats.csv"))
+    parser.add_argument("--model", default="qwen3:4b")
+    parser.add_argument("--out_file", default="judgments.parquet", help=".parquet (needs pyarrow) or .csv")
+    parser.add_argument("--cache_file", default="judge_cache.jsonl")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=4.0, help="max judge calls started per second; 0 = unlimited")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    run_judging(
+        chats_file=args.chats_file,
+        model=args.model,
+        out_file=args.out_file,
+        cache_file=args.cache_file,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        limit=args.limit,
+    )
@@ -0,0 +1,140 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+from evaluations.datasets import load
+
+SECTION_RE = r"^\s*(\d+[a-zA-Z]?(?:\.\d+)*)(?:\s|$)"
+CITED_RE = r"\b(\d+(?:\.\d+)+[a-zA-Z]?)\b"
+
+
+def section_numbers(sections: pd.Series) -> pd.Series:
+    # Same cleaning as evaluate_responses.clean_section / extract_section_number, applied column-wise
+    cleaned = sections.astype(str).str.replace(r"[^\w\d\. ]", "", regex=True).str.strip()
+    return cleaned.str.extract(SECTION_RE, expand=False)
+
+
+def ancestors(numbers: pd.Series) -> pd.Series:
+    # "15.15.2" -> ["15", "15.15", "15.15.2"]
+    parts = numbers.str.split(".")
+    return parts.map(lambda p: [".".join(p[:i + 1]) for i in range(len(p))])
+
+
+def ranked_sources(sources_df: pd.DataFrame) -> pd.DataFrame:
+    ranked = sources_df.assign(section_no=section_numbers(sources_df["section"]))
+    ranked = ranked.dropna(subset=["section_no"])
+    ranked = ranked.sort_values(["project_message_id", "distance"], ascending=[True, False], kind="stable")
+    ranked["rank"] = ranked.groupby("project_message_id").cumcount()
+    return ranked[["project_message_id", "section_no", "distance", "rank"]].reset_index(drop=True)
+
+
+def cited_sections(chats_df: pd.DataFrame, gt_df: pd.DataFrame, gt_col: str) -> pd.DataFrame:
+    ids = (
+        chats_df.assign(query_key=chats_df["query"].str.strip())
+        .drop_duplicates("query_key")[["query_key", "id"]]
+    )
+    gt = gt_df.assign(query_key=gt_df["query"].str.strip()).merge(ids, on="query_key", how="inner")
+    cited = gt[["id", gt_col]].assign(cited=gt[gt_col].astype(str).str.findall(CITED_RE))
+    cited = cited.explode("cited").dropna(subset=["cited"])
+    cited = cited.rename(columns={"id": "project_message_id"})
+    return cited[["project_message_id", "cited"]].drop_duplicates().reset_index(drop=True)
+
+
+def match_relevant(ranked: pd.DataFrame, cited: pd.DataFrame) -> pd.DataFrame:
+    # A retrieved section counts for a citation when one is the other or an ancestor of it (15.15 ~ 15.15.2)
+    keys = ["project_message_id", "rank"]
+    up = ranked.assign(anc=ancestors(ranked["section_no"])).explode("anc")
+    hits_up = up.merge(cited, left_on=["project_message_id", "anc"], right_on=["project_message_id", "cited"])
+    down = cited.assign(anc=ancestors(cited["cited"])).explode("anc")
+    hits_down = ranked.merge(down, left_on=["project_message_id", "section_no"], right_on=["project_message_id", "anc"])
+    hits = pd.concat([hits_up[keys + ["cited"]], hits_down[keys + ["cited"]]], ignore_index=True)
+    return hits.drop_duplicates()
+
+
+def retrieval_metrics(ranked: pd.DataFrame, cited: pd.DataFrame, ks) -> pd.DataFrame:
+    ks = np.asarray(sorted(ks))
+    n_rel = cited.groupby("project_message_id")["cited"].nunique()
+    msgs = n_rel.index
+    ranked = ranked[ranked["project_message_id"].isin(msgs)]
+    hits = match_relevant(ranked, cited)
+
+    # recall@k: first rank at which each cited section is hit, compared against every k at once
+    first_hit = hits.groupby(["project_message_id", "cited"])["rank"].min()
+    found = (first_hit.to_numpy()[:, None] < ks[None, :]).astype(float)
+    found = pd.DataFrame(found, index=first_hit.index.get_level_values(0)).groupby(level=0).sum()
+    recall = found.reindex(msgs, fill_value=0.0).to_numpy() / n_rel.to_numpy()[:, None]
+
+    # MRR: reciprocal of the first relevant rank
+    best = hits.groupby("project_message_id")["rank"].min().reindex(msgs)
+    rr = (1.0 / (best + 1)).fillna(0.0).to_numpy()
+
+    # nDCG@k with binary gains. Each cited section is credited once, at its first-hit rank, and each
+    # rank at most once, so DCG never exceeds the ideal of min(n_rel, k) hits at the top ranks.
+    rel_ranks = first_hit.reset_index()[["project_message_id", "rank"]].drop_duplicates()
+    discount = 1.0 / np.log2(rel_ranks["rank"].to_numpy() + 2)
+    within = rel_ranks["rank"].to_numpy()[:, None] < ks[None, :]
+    dcg = pd.DataFrame(within * discount[:, None], index=rel_ranks["project_message_id"].to_numpy())
+    dcg = dcg.groupby(level=0).sum().reindex(msgs, fill_value=0.0).to_numpy()
+    ideal = np.cumsum(1.0 / np.log2(np.arange(ks.max()) + 2))
+    ideal_n = np.minimum(n_rel.to_numpy()[:, None], ks[None, :])
+    idcg = ideal[ideal_n - 1]
+    ndcg = dcg / idcg
+    assert (ndcg <= 1 + 1e-9).all(), "nDCG above 1: DCG credited more hits than IDCG allows"
+
+    depth = ranked.groupby("project_message_id").size().reindex(msgs, fill_value=0).to_numpy()
+    rows = []
+    for j, k in enumerate(ks):
+        rows.append({
+            "k": int(k),
+            "recall": recall[:, j].mean(),
+            "mrr": rr.mean(),
+            "ndcg": ndcg[:, j].mean(),
+            "avg_retrieved": np.minimum(depth, k).mean(),
+            "messages": len(msgs),
+        })
+    return pd.DataFrame(rows)
+
+
+def sweep(sources_df, cited, ks, thresholds) -> pd.DataFrame:
+    # Higher distance ranks first (same ordering as get_top_sections); a threshold drops sections below it
+    ranked = ranked_sources(sources_df)
+    frames = []
+    for t in thresholds:
+        kept = ranked[ranked["distance"] >= t]
+        kept = kept.assign(rank=kept.groupby("project_message_id").cumcount())
+        frames.append(retrieval_metrics(kept, cited, ks).assign(threshold=t))
+    return pd.concat(frames, ignore_index=True)
+
+
+def run_retrieval_eval(chats_file, sources_file, gt_file, gt_col, ks, thresholds, out_csv):
+    chats_df = load(chats_file, ["id", "query"])
+    sources_df = load(sources_file, ["section", "project_message_id", "distance"])
+    gt_df = load(gt_file, ["query", gt_col])
+
+    cited = cited_sections(chats_df, gt_df, gt_col)
+    results = sweep(sources_df, cited, ks, thresholds)
+    results.to_csv(out_csv, index=False)
+    print(results.to_string(index=False))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats_file", required=True)
+    parser.add_argument("--sources_file", required=True)
+    parser.add_argument("--gt_file", required=True)
+    parser.add_argument("--gt_column", required=True)
+    parser.add_argument("--ks", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.0, 0.4, 0.5, 0.55, 0.6])
+    parser.add_argument("--out_csv", default="retrieval_metrics.csv")
+    args = parser.parse_args()
+
+    run_retrieval_eval(
+        chats_file=args.chats_file,
+        sources_file=args.sources_file,
+        gt_file=args.gt_file,
+        gt_col=args.gt_column,
+        ks=args.ks,
+        thresholds=args.thresholds,
+        out_csv=args.out_csv
+    )
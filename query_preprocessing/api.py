@@ -1,11 +1,24 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import os
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.requests import ClientDisconnect
+from starlette.routing import Match
 from pydantic import BaseModel
 from typing import List
 from fastapi.middleware.cors import CORSMiddleware
-from query_preprocessing.outlinesTesting import generate_decomposition, StructuredOutput
-from query_preprocessing.fullAgentImplementation import decompose, plan_subquery2, missingInfo
+from query_preprocessing import cancellation, tracing
+from query_preprocessing.fullAgentImplementation import decompose, plan_subquery2, missingInfo, agentGraph
+from query_preprocessing.structuredOutput import StructuredOutput
+from query_preprocessing.sessions import decompose_turn, store as session_store
+from query_preprocessing.voicePipeline import read_header, voice_decomposition_events
+from voice_to_text.streaming import WavStreamDecoder
 
 
+# How often a running request checks whether its client is still connected
+disconnect_poll_s = float(os.environ.get('DISCONNECT_POLL_S', 0.1))
+
 app = FastAPI()
 
 
@@ -21,6 +34,61 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def route_label(scope) -> str:
+    # Route template rather than the raw path, so /sessions/{session_id} is one series
+    for route in app.router.routes:
+        if route.matches(scope)[0] == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+# Every request is one trace; stage, LLM and parse spans opened while handling it attach to it.
+# Plain ASGI rather than @app.middleware("http"), which wraps `receive` and hides client
+# disconnects from Request.is_disconnected().
+class TraceMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with tracing.trace(route_label(scope)):
+            await self.app(scope, receive, send)
+
+
+app.add_middleware(TraceMiddleware)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(tracing.render_metrics(), media_type="text/plain; version=0.0.4")
+
+async def until_disconnect(request: Request, work):
+    # Runs the coroutine `work` under a CancelToken. If the client disconnects first, the token is
+    # cancelled, so streamed LLM calls underneath stop at their next token and graph stages stop
+    # scheduling, and the coroutine itself is cancelled.
+    token = cancellation.CancelToken()
+    with cancellation.scope(token):
+        task = asyncio.ensure_future(work)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=disconnect_poll_s)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            token.cancel()
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, cancellation.Cancelled):
+                pass
+            # Nobody is listening; 499 is what the access log will show
+            return Response(status_code=499)
+
+async def cancel_on_disconnect(receive, token):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+    token.cancel()
+
 # Request body model
 class PromptRequest(BaseModel):
     prompt: str
@@ -37,26 +105,128 @@ class GenerationRequest(BaseModel):
     query: str
     generatedResponse: str
 
+class SessionPromptRequest(BaseModel):
+    prompt: str
+    sessionId: str | None = None
+
+class SessionDecompResponse(BaseModel):
+    sessionId: str
+    decomposition: StructuredOutput | None = None
+    resolvedQueries: List[str]
+    reusedContext: bool
+    reusedQueries: bool
+
+class AgentQuery(BaseModel):
+    query: str
+    keywords: str
+    subqueries: str
+    directSubqueries: SubqueryResponse
+
+class Probe(BaseModel):
+    subquery: str
+    queries: List[str]
+    duplicates: List[str]
+
+class FullAgentsResponse(BaseModel):
+    decomposition: StructuredOutput | None = None
+    queries: List[AgentQuery]
+    probes: List[Probe]
+
 # POST endpoint for `decompose`
 @app.post("/juliette")
-def decomp(req: PromptRequest):
-    output = decompose("qwen3:4b", req.prompt)
-    return output
+async def decomp(req: PromptRequest, request: Request):
+    return await until_disconnect(request, asyncio.to_thread(decompose, "qwen3:4b", req.prompt))
+
+# POST endpoint for multi-turn decomposition: follow-ups resolve against the session's earlier
+# queries and continue from its Ollama context instead of resending the full prompt
+@app.post("/sessionDecomp", response_model=SessionDecompResponse)
+async def session_decomp(req: SessionPromptRequest, request: Request) -> SessionDecompResponse:
+    return await until_disconnect(request, asyncio.to_thread(decompose_turn, "qwen3:4b", req.prompt, req.sessionId))
+
+
+@app.delete("/sessions/{session_id}")
+def end_session(session_id: str):
+    return {"removed": session_store.drop(session_id)}
 
 # POST endpoint for `generate_decomposition`
 @app.post("/outlinesDecomp", response_model=StructuredOutput)
-def decomp2(req: PromptRequest) -> StructuredOutput:
-    output = generate_decomposition("qwen3:4b", req.prompt)
-    return output
+async def decomp2(req: PromptRequest, request: Request) -> StructuredOutput:
+    # outlines is only imported by workers that actually serve this route
+    from query_preprocessing.outlinesTesting import generate_decomposition
+    return await until_disconnect(request, asyncio.to_thread(generate_decomposition, "qwen3:4b", req.prompt))
 
 
 @app.post("/subqueryDirect", response_model=SubqueryResponse)
-def subquery_direct(req: PromptRequest):
-    return plan_subquery2("qwen3:4b", req.prompt)
+async def subquery_direct(req: PromptRequest, request: Request):
+    return await until_disconnect(request, asyncio.to_thread(plan_subquery2, "qwen3:4b", req.prompt))
 
 
 @app.post("/missingInfo", response_model=MissingInfoResponse)
-def missing_info_endpoint(req: GenerationRequest) -> MissingInfoResponse:
-    result = missingInfo("qwen3:4b", req.query, req.generatedResponse)
-    print(f"Missing info result: {result}")
-    return result
\ No newline at end of file
+async def missing_info_endpoint(req: GenerationRequest, request: Request) -> MissingInfoResponse:
+    result = await until_disconnect(request, asyncio.to_thread(missingInfo, "qwen3:4b", req.query, req.generatedResponse))
+    if not isinstance(result, Response):
+        print(f"Missing info result: {result}")
+    return result
+
+
+# POST endpoint running the whole preprocessing graph; each query's stages run concurrently
+@app.post("/fullAgents", response_model=FullAgentsResponse)
+async def full_agents(req: PromptRequest, request: Request) -> FullAgentsResponse:
+    out = await until_disconnect(request, agentGraph.run(["probes"], model="qwen3:4b", prompt=req.prompt))
+    if isinstance(out, Response):
+        return out
+    queries = [
+        AgentQuery(query=q, keywords=kw, subqueries=subq, directSubqueries=direct)
+        for q, kw, subq, direct in zip(out["queries"], out["keywords"], out["subqueries"], out["directSubqueries"])
+    ]
+    return FullAgentsResponse(decomposition=out["decomp"], queries=queries, probes=out["probes"])
+
+
+# StreamingResponse on servers below ASGI spec 2.4 calls receive() alongside the body to watch for
+# a disconnect, which steals http.request messages from an upload the body is still reading. This
+# one only sends, leaving receive to the endpoint.
+class UploadStreamingResponse(StreamingResponse):
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+# POST endpoint for spoken prompts: the raw WAV body is streamed into the transcriber and each
+# finished segment is decomposed while the rest of the audio is still being transcribed.
+# Responds with NDJSON "transcript" and "decomposition" events as they become available.
+@app.post("/voiceDecomp")
+async def voice_decomp(request: Request):
+    decoder = WavStreamDecoder()
+    chunks = request.stream()
+    try:
+        initial = await read_header(chunks, decoder)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    if not decoder.header_done:
+        raise HTTPException(status_code=400, detail="Incomplete WAV upload")
+
+    token = cancellation.CancelToken()
+    watchers = []
+
+    async def upload():
+        # Passes the rest of the upload through, then keeps reading receive() for the client's
+        # disconnect, which UploadStreamingResponse leaves to this endpoint
+        try:
+            async for data in chunks:
+                yield data
+        except ClientDisconnect:
+            token.cancel()
+            return
+        watchers.append(asyncio.ensure_future(cancel_on_disconnect(request.receive, token)))
+
+    async def body():
+        with cancellation.scope(token):
+            try:
+                async for event in voice_decomposition_events("qwen3:4b", upload(), decoder, initial):
+                    yield json.dumps(event) + "\n"
+            finally:
+                for task in watchers:
+                    task.cancel()
+
+    return UploadStreamingResponse(body(), media_type="application/x-ndjson")
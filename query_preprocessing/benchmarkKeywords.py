@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import statistics
+import time
+
+from query_preprocessing import localKeywords
+from query_preprocessing.fullAgentImplementation import extract_keywords
+from query_preprocessing.llmBackend import ReplayBackend, set_backend
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SETS = [os.path.join(HERE, "testPrompts.json"), os.path.join(HERE, "testPromptsExtra.json")]
+
+
+def keyword_list(kw_json):
+    return json.loads(kw_json)["keywords"]
+
+
+def tokens(keywords):
+    return {t.lower() for k in keywords for t in localKeywords.TOKEN_RE.findall(k)}
+
+
+def overlap(llm_kw, local_kw):
+    # Exact phrase Jaccard, plus how many of the LLM's keyword words the local keywords also contain
+    a, b = {k.lower() for k in llm_kw}, {k.lower() for k in local_kw}
+    jaccard = len(a & b) / len(a | b) if a | b else 1.0
+    llm_tokens = tokens(llm_kw)
+    token_recall = len(llm_tokens & tokens(local_kw)) / len(llm_tokens) if llm_tokens else 1.0
+    return jaccard, token_recall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and keyword overlap: LLM extract_keywords vs local MiniLM")
+    parser.add_argument("prompt_files", nargs="*", default=DEFAULT_SETS)
+    parser.add_argument("--model", default="qwen3:4b")
+    parser.add_argument("--recording", default=None, help="replay LLM calls from a recording instead of live Ollama")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--out_jsonl", default=None)
+    args = parser.parse_args()
+
+    queries = []
+    for path in args.prompt_files:
+        with open(path) as fh:
+            queries += [row["prompt"] for row in json.load(fh)]
+    queries = queries[:args.limit]
+    if args.recording:
+        set_backend(ReplayBackend(args.recording, "recorded"))
+
+    llm_times, llm_out = [], []
+    for q in queries:
+        start = time.perf_counter()
+        llm_out.append(keyword_list(extract_keywords(args.model, q)))
+        llm_times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    localKeywords.get_model()
+    load_s = time.perf_counter() - start
+    single_times = []
+    for q in queries:
+        start = time.perf_counter()
+        localKeywords.extract_keywords_local(q)
+        single_times.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    local_out = [keyword_list(k) for k in localKeywords.extract_keywords_batch(queries)]
+    batch_s = time.perf_counter() - start
+
+    scores = [overlap(a, b) for a, b in zip(llm_out, local_out)]
+    n = len(queries)
+    print(f"{n} queries from {', '.join(os.path.basename(p) for p in args.prompt_files)}")
+    print("| Extractor | Median per query (ms) | Total (s) |")
+    print("|---|---|---|")
+    print(f"| LLM ({args.model}) | {statistics.median(llm_times) * 1000:.0f} | {sum(llm_times):.2f} |")
+    print(f"| Local, one query per call | {statistics.median(single_times) * 1000:.1f} | {sum(single_times):.2f} |")
+    print(f"| Local, batched | {batch_s / n * 1000:.1f} | {batch_s:.2f} |")
+    print(f"Local model load: {load_s:.2f}s")
+    print(f"Mean exact-keyword Jaccard: {statistics.mean(s[0] for s in scores):.3f}")
+    print(f"Mean LLM keyword-word recall: {statistics.mean(s[1] for s in scores):.3f}")
+
+    if args.out_jsonl:
+        with open(args.out_jsonl, "w") as fh:
+            for q, a, b, (jaccard, recall) in zip(queries, llm_out, local_out, scores):
+                fh.write(json.dumps({"query": q, "llm": a, "local": b, "jaccard": jaccard,
+                                     "token_recall": recall}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
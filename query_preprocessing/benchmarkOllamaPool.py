@@ -0,0 +1,145 @@
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from query_preprocessing.llmBackend import OllamaBackend
+from query_preprocessing.ollamaPool import OllamaPool
+
+
+# Minimal stand-in for an Ollama server: /api/ps and /api/chat with a configurable latency. With
+# probability `stall_p` a chat stalls for `stall_s` extra seconds, which is how the slow instance
+# is injected. Streaming chats send `stream_tokens` chunks, one every `token_s` seconds, and
+# `streamed` records how many each one got out before finishing or being dropped.
+class FakeOllama:
+    def __init__(self, latency_s=0.05, stall_p=0.0, stall_s=0.0, models=("qwen3:4b",), seed=0,
+                 stream_tokens=50, token_s=0.02):
+        self.latency_s, self.stall_p, self.stall_s = latency_s, stall_p, stall_s
+        self.stream_tokens, self.token_s = stream_tokens, token_s
+        self.models = list(models)
+        self.rng = random.Random(seed)
+        self.served = 0
+        self.aborted = 0
+        self.streamed = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def reply(self, body):
+                data = json.dumps(body).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    fake.aborted += 1
+
+            def do_GET(self):
+                if self.path == "/api/ps":
+                    self.reply({"models": [{"name": m, "model": m} for m in fake.models]})
+                else:
+                    self.send_error(404)
+
+            def stream(self, request):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                sent = 0
+                try:
+                    for i in range(fake.stream_tokens):
+                        time.sleep(fake.token_s)
+                        done = i == fake.stream_tokens - 1
+                        chunk = {"model": request["model"], "created_at": "2025-01-01T00:00:00Z", "done": done,
+                                 "message": {"role": "assistant", "content": f"t{i} "}}
+                        if done:
+                            chunk.update(prompt_eval_count=10, eval_count=fake.stream_tokens)
+                        self.wfile.write((json.dumps(chunk) + "\n").encode())
+                        self.wfile.flush()
+                        sent += 1
+                except (BrokenPipeError, ConnectionResetError):
+                    fake.aborted += 1
+                fake.streamed.append(sent)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if request.get("stream"):
+                    return self.stream(request)
+                delay = fake.latency_s * fake.rng.uniform(0.8, 1.2)
+                if fake.rng.random() < fake.stall_p:
+                    delay += fake.stall_s
+                time.sleep(delay)
+                fake.served += 1
+                self.reply({"model": request["model"], "created_at": "2025-01-01T00:00:00Z", "done": True,
+                            "message": {"role": "assistant", "content": "ok"},
+                            "prompt_eval_count": 10, "eval_count": 2, "total_duration": int(delay * 1e9)})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.host = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def run_load(backend, requests, concurrency, model):
+    def one(i):
+        start = time.perf_counter()
+        backend.chat(model=model, messages=[{"role": "user", "content": f"prompt {i}"}])
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return np.array(list(pool.map(one, range(requests))))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="p50/p95/p99 of single-client vs pooled vs hedged calls against local fake Ollama servers")
+    parser.add_argument("--instances", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--stall_p", type=float, default=0.1, help="stall probability on the slow instance")
+    parser.add_argument("--stall_s", type=float, default=1.0)
+    parser.add_argument("--hedge_after", default="p95")
+    parser.add_argument("--model", default="qwen3:4b")
+    args = parser.parse_args()
+
+    # Instance 0 is the injected slow one
+    servers = [FakeOllama(args.latency, args.stall_p if i == 0 else 0.0, args.stall_s, seed=i)
+               for i in range(args.instances)]
+    hosts = [s.host for s in servers]
+    configs = [
+        ("single client (slow instance)", lambda: OllamaBackend(hosts[0])),
+        ("pool, least outstanding", lambda: OllamaPool(hosts, hedge_after="")),
+        (f"pool + hedge after {args.hedge_after}", lambda: OllamaPool(hosts, hedge_after=args.hedge_after)),
+    ]
+
+    print("| Backend | p50 (ms) | p95 (ms) | p99 (ms) | Max (ms) | Hedged | Hedge wins | Cancelled |")
+    print("|---|---|---|---|---|---|---|---|")
+    for label, make in configs:
+        backend = make()
+        time.sleep(0.2)  # first health probe
+        latencies = run_load(backend, args.requests, args.concurrency, args.model) * 1000
+        counts = backend.stats() if isinstance(backend, OllamaPool) else {}
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"| {label} | {p50:.0f} | {p95:.0f} | {p99:.0f} | {latencies.max():.0f} | "
+              f"{counts.get('hedged', '-')} | {counts.get('hedge_wins', '-')} | {counts.get('cancelled', '-')} |")
+        if isinstance(backend, OllamaPool):
+            backend.close()
+
+    for server in servers:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
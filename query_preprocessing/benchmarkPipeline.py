@@ -0,0 +1,45 @@
+import argparse
+import asyncio
+import json
+import time
+
+from query_preprocessing.dagExecutor import Graph
+from query_preprocessing.fullAgentImplementation import agentGraph, run_prompts
+from query_preprocessing.llmBackend import RecordingBackend, OllamaBackend, ReplayBackend, set_backend
+
+
+def time_pipeline(model_name, prompts, concurrency):
+    # Fresh graph per run so memoized outputs from an earlier run don't hide the work
+    graph = Graph(agentGraph.nodes.values(), max_concurrency=concurrency)
+    start = time.perf_counter()
+    asyncio.run(run_prompts(model_name, prompts, graph))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the preprocessing graph against a recorded LLM session (no model server needed)")
+    parser.add_argument("prompts")
+    parser.add_argument("--model", default="qwen3:4b")
+    parser.add_argument("--recording", default="llm_recording.jsonl.gz")
+    parser.add_argument("--record", action="store_true", help="run once against live Ollama and record it first")
+    parser.add_argument("--latency", choices=["recorded", "zero"], default="recorded")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    with open(args.prompts) as fh:
+        prompts = [row["prompt"] for row in json.load(fh)]
+
+    if args.record:
+        set_backend(RecordingBackend(OllamaBackend(), args.recording))
+        print(f"Recorded live run: {time_pipeline(args.model, prompts, max(args.concurrency)):.2f}s")
+
+    set_backend(ReplayBackend(args.recording, args.latency))
+    print(f"| Concurrency | Wall (s) | Latency |")
+    print(f"|---|---|---|")
+    for concurrency in args.concurrency:
+        print(f"| {concurrency} | {time_pipeline(args.model, prompts, concurrency):.2f} | {args.latency} |")
+
+
+if __name__ == "__main__":
+    main()
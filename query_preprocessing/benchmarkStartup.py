@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that must only load when the feature needing them is first used
+HEAVY = ("torch", "transformers", "whisper", "outlines", "sentence_transformers", "sklearn", "scipy", "faster_whisper")
+
+# module: (max import seconds, max RSS MB after import). The API module is what each uvicorn
+# worker pays before serving its first request.
+BUDGETS = {
+    "query_preprocessing.api": (2.0, 150),
+    "query_preprocessing.fullAgentImplementation": (1.5, 120),
+    "voice_to_text.voicetotext": (1.0, 100),
+    "voice_to_text.streaming": (1.0, 100),
+    "evaluations.evaluate_responses": (1.5, 150),
+}
+
+# Runs in a fresh interpreter so nothing is already imported
+CHILD = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - t0
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+try:
+    with open("/proc/self/status") as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+except (OSError, StopIteration):
+    pass
+print(json.dumps({"import_s": elapsed, "rss_mb": rss_kb / 1024,
+                  "heavy": [m for m in sys.argv[2:] if m in sys.modules]}))
+"""
+
+
+def measure(module):
+    out = subprocess.run([sys.executable, "-c", CHILD, module, *HEAVY],
+                         capture_output=True, text=True, check=True, cwd=REPO_ROOT)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run(modules, repeats, slack):
+    failures = []
+    results = {}
+    print("| Module | Import (s) | RSS (MB) | Budget (s / MB) | Heavy libraries loaded |")
+    print("|---|---|---|---|---|")
+    for module in modules:
+        runs = [measure(module) for _ in range(repeats)]
+        import_s = statistics.median(r["import_s"] for r in runs)
+        rss_mb = statistics.median(r["rss_mb"] for r in runs)
+        heavy = runs[-1]["heavy"]
+        max_s, max_mb = BUDGETS.get(module, (None, None))
+        results[module] = {"import_s": import_s, "rss_mb": rss_mb, "heavy": heavy}
+        budget = f"{max_s} / {max_mb}" if max_s else "-"
+        print(f"| {module} | {import_s:.2f} | {rss_mb:.0f} | {budget} | {', '.join(heavy) or '-'} |")
+
+        if heavy:
+            failures.append(f"{module} imports {', '.join(heavy)} at startup")
+        if max_s and import_s > max_s * slack:
+            failures.append(f"{module} import took {import_s:.2f}s (budget {max_s}s)")
+        if max_mb and rss_mb > max_mb * slack:
+            failures.append(f"{module} RSS is {rss_mb:.0f} MB (budget {max_mb} MB)")
+    return results, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cold import time and RSS per module, checked against startup budgets")
+    parser.add_argument("modules", nargs="*", default=list(BUDGETS))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--slack", type=float, default=1.0, help="multiply every budget, e.g. 1.5 on slow CI machines")
+    parser.add_argument("--out_json", default=None)
+    args = parser.parse_args()
+
+    results, failures = run(args.modules, args.repeats, args.slack)
+    if args.out_json:
+        with open(args.out_json, "w") as fh:
+            json.dump(results, fh, indent=2)
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
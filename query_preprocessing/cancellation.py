@@ -0,0 +1,121 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from query_preprocessing import tracing
+
+
+class Cancelled(Exception):
+    def __init__(self, reason="cancelled", generated=0):
+        super().__init__(reason)
+        self.generated = generated
+
+
+# Set by the API when the client goes away; LLM calls running under it stop at the next
+# streamed chunk, and graph stages stop before their next attempt
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self.reason = None
+
+    def cancel(self, reason="client disconnected"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback):
+        # Runs `callback` on cancel, or right away if already cancelled
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout) -> bool:
+        # Sleeps up to `timeout`, returning True early if cancelled
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self, generated=0):
+        if self._event.is_set():
+            raise Cancelled(self.reason, generated)
+
+
+_token: ContextVar = ContextVar("cancel_token", default=None)
+
+
+def current():
+    return _token.get()
+
+
+def raise_if_cancelled():
+    token = _token.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+@contextmanager
+def scope(token: CancelToken):
+    reset = _token.set(token)
+    try:
+        yield token
+    finally:
+        _token.reset(reset)
+
+
+def stream_until_cancelled(op, start_stream, token: CancelToken):
+    # Consumes a streaming ollama call, checking the token between chunks. On cancel the stream
+    # is closed, which drops the HTTP connection, and Ollama stops generating.
+    parts, generated, last = [], 0, None
+    stream = start_stream()
+    try:
+        for chunk in stream:
+            token.raise_if_cancelled(generated)
+            last = chunk
+            generated += 1
+            parts.append(chunk.message.content if op == "chat" else chunk.response)
+    finally:
+        stream.close()
+    if last is None:
+        # A stream that ends without a single chunk has no response to return
+        token.raise_if_cancelled(generated)
+        raise RuntimeError(f"Ollama {op} stream ended without a response")
+    # The final chunk carries the counts and durations; give it the whole text
+    if op == "chat":
+        last.message.content = "".join(parts)
+    else:
+        last.response = "".join(parts)
+    return last
+
+
+# Running mean of eval_count per model, used to estimate how many tokens a cancelled call would
+# still have generated
+_completed = defaultdict(lambda: [0, 0])  # model -> [calls, eval tokens]
+_lock = threading.Lock()
+
+
+def record_completion(model, eval_count):
+    with _lock:
+        stats = _completed[model]
+        stats[0] += 1
+        stats[1] += eval_count or 0
+
+
+def record_cancel(model, generated):
+    with _lock:
+        calls, tokens = _completed[model]
+    expected = tokens / calls if calls else 0
+    tracing.observe("llm_cancelled_total", 1, model=model)
+    tracing.observe("llm_cancelled_generated_tokens_total", generated, model=model)
+    tracing.observe("llm_cancelled_tokens_saved_total", max(expected - generated, 0), model=model)
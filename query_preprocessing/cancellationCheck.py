@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from query_preprocessing import cancellation, tracing
+from query_preprocessing.api import app
+from query_preprocessing.benchmarkOllamaPool import FakeOllama
+from query_preprocessing.fullAgentImplementation import chat
+from query_preprocessing.llmBackend import OllamaBackend, set_backend
+
+
+async def call_and_disconnect(path, body, disconnect_after):
+    # Drives the ASGI app directly: sends the request, then reports http.disconnect as a browser
+    # navigating away would. Like uvicorn, a disconnect that already happened is returned without
+    # awaiting anything.
+    sent = {"body": False}
+    start = time.perf_counter()
+
+    async def receive():
+        if not sent["body"]:
+            sent["body"] = True
+            return {"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}
+        remaining = disconnect_after - (time.perf_counter() - start)
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        return {"type": "http.disconnect"}
+
+    status = {}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "root_path": "", "headers": [(b"content-type", b"application/json")],
+             "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80)}
+    await app(scope, receive, send)
+    return status.get("code"), time.perf_counter() - start
+
+
+def counter(text, name):
+    return sum(float(line.split()[-1]) for line in text.splitlines() if line.startswith(name + "{"))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Checks that a disconnected client stops its LLM generation, against a slow fake Ollama")
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--token_s", type=float, default=0.02)
+    parser.add_argument("--disconnect_after", type=float, default=0.3)
+    args = parser.parse_args()
+
+    fake = FakeOllama(stream_tokens=args.tokens, token_s=args.token_s)
+    set_backend(OllamaBackend(fake.host))
+    full_s = args.tokens * args.token_s
+    failures = []
+
+    # One streamed call that finishes, so the saved-token estimate has a typical generation length
+    with cancellation.scope(cancellation.CancelToken()):
+        chat("qwen3:4b", [{"role": "user", "content": "warm-up"}])
+
+    for path, body in (("/subqueryDirect", {"prompt": "Who certifies substantial completion?"}),
+                       ("/missingInfo", {"query": "q", "generatedResponse": "r"}),
+                       ("/fullAgents", {"prompt": "Who certifies substantial completion?"})):
+        before = len(fake.streamed)
+        status, elapsed = asyncio.run(call_and_disconnect(path, body, args.disconnect_after))
+        time.sleep(3 * args.token_s)  # let the fake notice the dropped connection
+        streamed = fake.streamed[before:]
+        print(f"{path}: status {status} after {elapsed:.2f}s (full generation {full_s:.2f}s), "
+              f"fake sent {streamed} of {args.tokens} tokens")
+        if status != 499 or not streamed or max(streamed) >= args.tokens:
+            failures.append(path)
+
+    metrics = tracing.render_metrics()
+    print(f"llm_cancelled_total {counter(metrics, 'llm_cancelled_total'):.0f}")
+    print(f"llm_cancelled_generated_tokens_total {counter(metrics, 'llm_cancelled_generated_tokens_total'):.0f}")
+    print(f"llm_cancelled_tokens_saved_total {counter(metrics, 'llm_cancelled_tokens_saved_total'):.0f}")
+    fake.stop()
+    if failures:
+        print(f"FAILED: generation kept running for {', '.join(failures)}")
+        sys.exit(1)
+    print("OK: generation stopped after disconnect")
+
+
+if __name__ == "__main__":
+    main()
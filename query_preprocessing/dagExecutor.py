@@ -0,0 +1,196 @@
+import asyncio
+import contextvars
+import functools
+import hashlib
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from query_preprocessing import cancellation, tracing
+
+
+@dataclass
+class Node:
+    name: str
+    fn: Callable
+    inputs: tuple = ()
+    # Name of one input holding a list: fn runs once per item, concurrently, and the node's
+    # output is the list of results in item order
+    map_over: Optional[str] = None
+    timeout: Optional[float] = None
+    retries: int = 0
+    memoize: bool = True
+    # Only results this accepts are memoized, so a failed parse or fallback is retried on the
+    # next run instead of being served for the life of the process. None is never memoized.
+    cache_if: Optional[Callable[[Any], bool]] = None
+
+
+class NodeFailed(Exception):
+    def __init__(self, node: str, cause: BaseException):
+        super().__init__(f"Node {node!r} failed: {cause!r}")
+        self.node = node
+        self.cause = cause
+
+
+# Small DAG engine for the preprocessing stages. Each node starts as soon as all of its inputs
+# are available, so independent branches run concurrently; a shared semaphore caps how many
+# stage calls (including mapped items) are in flight. Sync functions run in worker threads.
+class Graph:
+    def __init__(self, nodes=(), max_concurrency: int = 8, memo_size: int = 1024, retry_backoff: float = 0.5):
+        self.nodes: dict[str, Node] = {}
+        self.max_concurrency = max_concurrency
+        self.retry_backoff = retry_backoff
+        self.memo_size = memo_size
+        self._memo: OrderedDict = OrderedDict()
+        # run_sync may be called from several threads at once, each with its own event loop: the
+        # memo is shared under a lock, and every loop gets its own semaphore
+        self._lock = threading.Lock()
+        self._semaphores: dict = {}
+        # Own pool sized to max_concurrency; the default executor is capped by CPU count,
+        # which is far too small for stages that mostly wait on the LLM server
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="graph")
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: Node):
+        if node.name in self.nodes:
+            raise ValueError(f"Duplicate node {node.name!r}")
+        if node.map_over is not None and node.map_over not in node.inputs:
+            raise ValueError(f"Node {node.name!r} maps over {node.map_over!r}, which is not one of its inputs")
+        self.nodes[node.name] = node
+        return node
+
+    def node(self, *inputs, name=None, **options):
+        # Decorator form: @graph.node("model", "prompt")
+        def register(fn):
+            self.add(Node(name or fn.__name__, fn, tuple(inputs), **options))
+            return fn
+        return register
+
+    def _check(self, provided):
+        seen, visiting = set(), set()
+
+        def visit(name, path):
+            if name in provided and name not in self.nodes:
+                return
+            if name not in self.nodes:
+                raise ValueError(f"Unknown input {name!r} (required by {path[-1]!r})")
+            if name in visiting:
+                raise ValueError(f"Cycle through {' -> '.join(path + [name])}")
+            if name in seen:
+                return
+            visiting.add(name)
+            for dep in self.nodes[name].inputs:
+                visit(dep, path + [name])
+            visiting.discard(name)
+            seen.add(name)
+
+        for name in self.nodes:
+            visit(name, [])
+
+    def _memo_key(self, node: Node, args):
+        try:
+            payload = json.dumps([node.name, getattr(node.fn, "__qualname__", repr(node.fn)), args],
+                                 sort_keys=True, default=repr)
+        except (TypeError, ValueError):
+            return None
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def _call(self, node: Node, args, semaphore):
+        key = self._memo_key(node, args) if node.memoize else None
+        if key is not None:
+            with self._lock:
+                if key in self._memo:
+                    self._memo.move_to_end(key)
+                    return self._memo[key]
+
+        for attempt in range(node.retries + 1):
+            cancellation.raise_if_cancelled()
+            try:
+                with tracing.span(node.name, "stage", stage=node.name, attempt=attempt) as sp:
+                    ready = time.perf_counter()
+                    async with semaphore:
+                        wait = time.perf_counter() - ready
+                        sp.set(queue_wait=wait)
+                        tracing.observe("stage_queue_wait_seconds", wait, stage=node.name)
+                        if inspect.iscoroutinefunction(node.fn):
+                            call = node.fn(*args)
+                        else:
+                            # A timed-out thread cannot be interrupted; its result is simply discarded.
+                            # The context is copied so spans opened in the thread join this trace.
+                            ctx = contextvars.copy_context()
+                            call = asyncio.get_running_loop().run_in_executor(
+                                self._executor, functools.partial(ctx.run, node.fn, *args))
+                        result = await asyncio.wait_for(call, node.timeout)
+                break
+            except (asyncio.CancelledError, cancellation.Cancelled):
+                raise
+            except Exception as e:
+                if attempt == node.retries:
+                    raise NodeFailed(node.name, e) from e
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+
+        if key is not None and result is not None and (node.cache_if is None or node.cache_if(result)):
+            with self._lock:
+                self._memo[key] = result
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+        return result
+
+    async def _run_node(self, node: Node, futures, semaphore):
+        values = [await futures[name] for name in node.inputs]
+        if node.map_over is None:
+            return await self._call(node, values, semaphore)
+
+        index = node.inputs.index(node.map_over)
+        items = values[index] or []
+        calls = []
+        for item in items:
+            args = list(values)
+            args[index] = item
+            calls.append(self._call(node, args, semaphore))
+        return list(await asyncio.gather(*calls))
+
+    async def run(self, targets=None, **inputs) -> dict[str, Any]:
+        self._check(inputs)
+        loop = asyncio.get_running_loop()
+        # One semaphore per event loop, so concurrent runs on that loop share the max_concurrency budget
+        with self._lock:
+            # A semaphore holds its loop, so entries for finished asyncio.run() loops are dropped here
+            for closed in [l for l in self._semaphores if l.is_closed()]:
+                del self._semaphores[closed]
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        futures: dict[str, asyncio.Future] = {}
+        for name, value in inputs.items():
+            futures[name] = loop.create_future()
+            futures[name].set_result(value)
+
+        # Only the requested targets and what they depend on are scheduled
+        needed, stack = set(), list(targets or self.nodes)
+        while stack:
+            name = stack.pop()
+            if name in needed or name not in self.nodes:
+                continue
+            needed.add(name)
+            stack.extend(self.nodes[name].inputs)
+
+        tasks = {}
+        for name in self.nodes:
+            if name in needed:
+                tasks[name] = futures[name] = asyncio.ensure_future(self._run_node(self.nodes[name], futures, semaphore))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        return {name: task.result() for name, task in tasks.items()}
+
+    def run_sync(self, targets=None, **inputs) -> dict[str, Any]:
+        return asyncio.run(self.run(targets, **inputs))
@@ -1,10 +1,23 @@
+import asyncio
 import json
+import os
 import sys
-import ollama
 import re
 
 from typing import Union
 
+from query_preprocessing.dagExecutor import Graph, Node
+from query_preprocessing.llmBackend import get_backend
+from query_preprocessing.subqueryDedup import dedup_subqueries
+from query_preprocessing.structuredOutput import KeywordOutput, StructuredOutput, structured_chat
+
+stage_timeout = float(os.environ.get('STAGE_TIMEOUT', 120))
+stage_retries = int(os.environ.get('STAGE_RETRIES', 1))
+stage_concurrency = int(os.environ.get('STAGE_CONCURRENCY', 8))
+# "llm" asks the model for keywords per query; "local" ranks n-grams of the query with MiniLM
+# embeddings (localKeywords), batched over all of a prompt's queries
+keyword_mode = os.environ.get('KEYWORD_MODE', 'llm')
+
 decompSys = """\
 You are the decomposition module for a construction-contract Q&A pipeline.
 
@@ -461,9 +474,9 @@ def missingInfo(model: str, query: str, generatedResponse: str) -> dict[str, Uni
     
 
 
-def chat(model: str, messages: list) -> str:
-    return ollama.chat(
-        model=model, messages=messages, options={"temperature": 0}, think=False
+def chat(model: str, messages: list, format=None) -> str:
+    return get_backend().chat(
+        model=model, messages=messages, options={"temperature": 0}, think=False, format=format
     )["message"]["content"].strip()
 
 
@@ -473,11 +486,8 @@ def decompose(model: str, prompt: str):
         *fewshotDecomp,
         {"role": "user", "content": prompt},
     ]
-    raw = chat("qwen3:4b", msgs)
-    try:
-        return json.loads(raw)
-    except json.JSONDecodeError:
-        return None
+    result = structured_chat(chat, model, msgs, StructuredOutput)
+    return result.model_dump() if result else None
 
 
 def extract_keywords(model: str, query: str) -> str:
@@ -486,7 +496,17 @@ def extract_keywords(model: str, query: str) -> str:
         *fewshotKeyword,
         {"role": "user", "content": query},
     ]
-    return chat(model, msgs)
+    # Validated and re-serialized, so plan_subqueries always receives {"prompt", "keywords"} JSON
+    result = structured_chat(chat, model, msgs, KeywordOutput)
+    if result is None:
+        result = KeywordOutput(prompt=query, keywords=[])
+    return result.model_dump_json()
+
+
+def extract_keywords_all(model: str, queries: list) -> list:
+    # Local mode: one call for every query of a prompt, so encoding is batched
+    from query_preprocessing.localKeywords import extract_keywords_batch
+    return extract_keywords_batch(queries or [])
 
 
 def plan_subqueries(model: str, kw_json: str) -> str:
@@ -511,19 +531,51 @@ def print_per_prompt(prompt: str, decomp: dict):
     for n in decomp.get("noise", []):
         print(md_row(prompt, "noise", n))
 
+def has_keywords(kw_json: str) -> bool:
+    # extract_keywords falls back to an empty keyword list when the output never parsed
+    return bool(json.loads(kw_json)["keywords"])
+
+
+def decomposed_queries(decomp) -> list:
+    return decomp.get("queries", []) if decomp else []
+
+
+if keyword_mode == "local":
+    keywordsNode = Node("keywords", extract_keywords_all, ("model", "queries"),
+                        timeout=stage_timeout, retries=stage_retries)
+else:
+    keywordsNode = Node("keywords", extract_keywords, ("model", "queries"), map_over="queries",
+                        timeout=stage_timeout, retries=stage_retries, cache_if=has_keywords)
+
+# decompose -> per-query extract_keywords -> plan_subqueries, with plan_subquery2 as an
+# independent branch per query. The graph runs every query's chain concurrently; "probes" then
+# collapses near-duplicate subqueries across all of them before retrieval.
+agentGraph = Graph([
+    Node("decomp", decompose, ("model", "prompt"), timeout=stage_timeout, retries=stage_retries),
+    Node("queries", decomposed_queries, ("decomp",), memoize=False),
+    keywordsNode,
+    Node("subqueries", plan_subqueries, ("model", "keywords"), map_over="keywords",
+         timeout=stage_timeout, retries=stage_retries),
+    Node("directSubqueries", plan_subquery2, ("model", "queries"), map_over="queries",
+         timeout=stage_timeout, retries=stage_retries),
+    Node("probes", dedup_subqueries, ("queries", "subqueries", "directSubqueries"), timeout=stage_timeout),
+], max_concurrency=stage_concurrency)
+
+
 def fullAgents(model: str, prompt: str):
-    keywords, subqueries = [],[]
-    decomp = decompose(model,prompt)
-    if decomp and decomp.get("queries"):
-            for q in decomp["queries"]:
-                keyword = extract_keywords(model, q)
-                subq = plan_subqueries(model, keyword)
-                keywords.append((q, keyword))
-                subqueries.append((q, subq))
+    out = agentGraph.run_sync(["keywords", "subqueries"], model=model, prompt=prompt)
+    queries = out["queries"]
+    keywords = list(zip(queries, out["keywords"]))
+    subqueries = list(zip(queries, out["subqueries"]))
+    return keywords, subqueries
 
-    return keywords, subqueries 
 
-    
+async def run_prompts(model_name: str, prompts: list, graph: Graph = agentGraph) -> list:
+    # Every prompt's graph runs at once; the graph's max_concurrency bounds the LLM calls
+    return await asyncio.gather(*[
+        graph.run(["decomp", "subqueries", "directSubqueries"], model=model_name, prompt=prompt)
+        for prompt in prompts
+    ])
 
 
 def main(argv):
@@ -539,27 +591,23 @@ def main(argv):
     print("| Query | Subquery |")
     print("|---|---|")
 
-    for item in prompts_data:
+    outputs = asyncio.run(run_prompts(model_name, [item["prompt"] for item in prompts_data]))
+    for item, out in zip(prompts_data, outputs):
         prompt = item["prompt"]
         ground_truth = 1 if item.get("value") else 0
 
-        decomp = decompose(model_name, prompt)
+        decomp = out["decomp"]
         decomp_json.append((prompt, decomp))
 
         is_query = 1 if decomp and decomp.get("queries") else 0
         preds.append(is_query)
         truth.append(ground_truth)
 
-        if decomp and decomp.get("queries"):
-            for q in decomp["queries"]:
-                kw_json = extract_keywords(model_name, q)
-                subq = plan_subqueries(model_name, kw_json)
-                subquery = plan_subquery2(model_name, q)
-
-                subqueries.append(subquery)
-                kw_outputs.append((q, kw_json))
-                sub_outputs.append((q, subq))
-                print(f"| {q} | {subquery} |")
+        for q, kw_json, subq, subquery in zip(out["queries"], out["keywords"], out["subqueries"], out["directSubqueries"]):
+            subqueries.append(subquery)
+            kw_outputs.append((q, kw_json))
+            sub_outputs.append((q, subq))
+            print(f"| {q} | {subquery} |")
 
 
 
@@ -0,0 +1,205 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+import ollama
+
+from query_preprocessing import cancellation, tracing
+from query_preprocessing.ollamaPool import OllamaPool
+
+# LLM_BACKEND=ollama (default) | record | replay; LLM_RECORDING is the file written or read
+backend_kind = os.environ.get('LLM_BACKEND', 'ollama')
+recording_path = os.environ.get('LLM_RECORDING', 'llm_recording.jsonl.gz')
+# "recorded" sleeps for each call's recorded duration, "zero" answers immediately
+replay_latency = os.environ.get('LLM_REPLAY_LATENCY', 'recorded')
+# Comma-separated Ollama instances, e.g. "http://127.0.0.1:11434,http://127.0.0.1:11435".
+# More than one puts live calls behind an OllamaPool; unset uses the default client.
+ollama_hosts = [h.strip() for h in os.environ.get('OLLAMA_HOSTS', '').split(',') if h.strip()]
+
+RESPONSE_TYPES = {"chat": ollama.ChatResponse, "generate": ollama.GenerateResponse}
+
+
+class ReplayMiss(KeyError):
+    pass
+
+
+def request_key(op: str, request: dict) -> str:
+    payload = json.dumps([op, request], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def open_recording(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+# Every backend takes the keyword arguments of ollama.chat / ollama.generate and returns the
+# matching ollama response object, so callers do not care which one is active.
+class OllamaBackend:
+    def __init__(self, host=None):
+        self.client = ollama.Client(host) if host else ollama
+
+    def _call(self, op, request):
+        # Under a cancel token the call is streamed, so it can be abandoned between tokens
+        token = cancellation.current()
+        if token is None or request.get("stream"):
+            return getattr(self.client, op)(**request)
+        token.raise_if_cancelled()
+        return cancellation.stream_until_cancelled(
+            op, lambda: getattr(self.client, op)(**request, stream=True), token)
+
+    def chat(self, **request):
+        return self._call("chat", request)
+
+    def generate(self, **request):
+        return self._call("generate", request)
+
+
+# Passes calls through to another backend and appends one JSON line per call:
+# the request, its response and how long it took
+class RecordingBackend:
+    def __init__(self, inner, path=recording_path):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _call(self, op, request):
+        start = time.perf_counter()
+        response = getattr(self.inner, op)(**request)
+        elapsed = time.perf_counter() - start
+        line = json.dumps({
+            "op": op,
+            "key": request_key(op, request),
+            "request": request,
+            "response": response.model_dump(mode="json", exclude_none=True),
+            "elapsed": round(elapsed, 4),
+        }, ensure_ascii=False, default=str)
+        with self._lock, open_recording(self.path, "a") as f:
+            f.write(line + "\n")
+        return response
+
+    def chat(self, **request):
+        return self._call("chat", request)
+
+    def generate(self, **request):
+        return self._call("generate", request)
+
+
+# Serves recorded responses by request key. Repeated identical requests get their recorded
+# responses in order, cycling once exhausted; unknown requests raise ReplayMiss.
+class ReplayBackend:
+    def __init__(self, path=recording_path, latency=replay_latency):
+        if latency not in ("recorded", "zero"):
+            raise ValueError(f"latency must be 'recorded' or 'zero', not {latency!r}")
+        self.latency = latency
+        self._entries = defaultdict(list)
+        self._served = defaultdict(int)
+        self._lock = threading.Lock()
+        with open_recording(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry)
+
+    def _call(self, op, request):
+        key = request_key(op, request)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise ReplayMiss(f"No recorded {op} response for model {request.get('model')!r} (key {key[:12]})")
+            entry = entries[self._served[key] % len(entries)]
+            self._served[key] += 1
+        if self.latency == "recorded":
+            token = cancellation.current()
+            start = time.perf_counter()
+            if token is None:
+                time.sleep(entry["elapsed"])
+            elif token.wait(entry["elapsed"]):
+                # Tokens are assumed to have streamed at a steady rate up to the cancel
+                done = (time.perf_counter() - start) / entry["elapsed"]
+                raise cancellation.Cancelled(token.reason, int(done * entry["response"].get("eval_count", 0)))
+        return RESPONSE_TYPES[op].model_validate(entry["response"])
+
+    def chat(self, **request):
+        return self._call("chat", request)
+
+    def generate(self, **request):
+        return self._call("generate", request)
+
+
+# Outermost wrapper around whichever backend is active: one "llm" span per call with Ollama's
+# token counts and durations
+class TracedBackend:
+    def __init__(self, inner):
+        self.inner = inner
+
+    def _call(self, op, request):
+        model = request.get("model", "")
+        with tracing.span(f"llm.{op}", "llm", model=model, op=op) as s:
+            try:
+                response = getattr(self.inner, op)(**request)
+            except cancellation.Cancelled as e:
+                s.set(cancelled=True, generated=e.generated)
+                cancellation.record_cancel(model, e.generated)
+                raise
+            tracing.record_llm_response(s, response)
+        cancellation.record_completion(model, response.get("eval_count"))
+        return response
+
+    def chat(self, **request):
+        return self._call("chat", request)
+
+    def generate(self, **request):
+        return self._call("generate", request)
+
+
+# ollama.Client view of the active backend, for libraries that take a client (outlines)
+class BackendClient(ollama.Client):
+    def __init__(self, backend):
+        super().__init__()
+        self.backend = backend
+
+    def chat(self, **request):
+        return self.backend.chat(**request)
+
+    def generate(self, **request):
+        return self.backend.generate(**request)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def live_backend(hosts=ollama_hosts):
+    if len(hosts) > 1:
+        return OllamaPool(hosts)
+    return OllamaBackend(hosts[0] if hosts else None)
+
+
+def make_backend(kind=backend_kind, path=recording_path, latency=replay_latency):
+    if kind == "ollama":
+        return live_backend()
+    if kind == "record":
+        return RecordingBackend(live_backend(), path)
+    if kind == "replay":
+        return ReplayBackend(path, latency)
+    raise ValueError(f"Unknown LLM_BACKEND {kind!r}; expected ollama, record or replay")
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = TracedBackend(make_backend())
+        return _backend
+
+
+def set_backend(backend):
+    global _backend
+    with _backend_lock:
+        _backend = TracedBackend(backend)
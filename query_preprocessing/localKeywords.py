@@ -0,0 +1,99 @@
+import os
+import re
+import threading
+
+import numpy as np
+
+from query_preprocessing.structuredOutput import KeywordOutput
+
+keyword_model = os.environ.get('KEYWORD_MODEL', 'all-MiniLM-L6-v2')
+# 0 ranks purely by similarity to the query; higher values trade relevance for variety (MMR)
+keyword_diversity = float(os.environ.get('KEYWORD_DIVERSITY', 0.5))
+keyword_batch_size = int(os.environ.get('KEYWORD_BATCH_SIZE', 64))
+MAX_NGRAM = 3
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her
+here hers how i if in into is it its itself just me more most my no nor not of off on once only or other
+our out over own same she should so some such than that the their them then there these they this those
+through to too under until up very was we were what when where which while who whom why will with would
+you your please tell show give list explain describe define
+""".split())
+
+# Words, keeping amounts and section numbers ("$50,000", "30%", "7.2.1") in one piece
+TOKEN_RE = re.compile(r"\$?\d[\d,.]*%?|[A-Za-z][\w'-]*")
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    # sentence-transformers is only imported when the local mode is first used
+    global _model
+    with _model_lock:
+        if _model is None:
+            from sentence_transformers import SentenceTransformer
+            _model = SentenceTransformer(keyword_model)
+        return _model
+
+
+def encode(texts):
+    return get_model().encode(texts, batch_size=keyword_batch_size, normalize_embeddings=True,
+                              convert_to_numpy=True)
+
+
+def candidates(query: str, max_ngram: int = MAX_NGRAM) -> list:
+    # Contiguous 1..max_ngram word spans that neither start nor end on a stopword
+    tokens = [t.rstrip(".,") or t for t in TOKEN_RE.findall(query)]
+    seen, out = set(), []
+    for n in range(1, max_ngram + 1):
+        for i in range(len(tokens) - n + 1):
+            span = tokens[i:i + n]
+            if span[0].lower() in STOPWORDS or span[-1].lower() in STOPWORDS:
+                continue
+            phrase = " ".join(span)
+            if phrase.lower() not in seen:
+                seen.add(phrase.lower())
+                out.append(phrase)
+    return out
+
+
+def mmr(query_vec, cand_vecs, top_n, diversity):
+    # Maximal marginal relevance over unit vectors: each pick maximizes
+    # (1 - diversity) * sim(query) - diversity * max sim(already picked)
+    relevance = cand_vecs @ query_vec
+    pairwise = cand_vecs @ cand_vecs.T
+    picked = [int(np.argmax(relevance))]
+    redundancy = pairwise[picked[0]].copy()
+    while len(picked) < min(top_n, len(cand_vecs)):
+        score = (1 - diversity) * relevance - diversity * redundancy
+        score[picked] = -np.inf
+        best = int(np.argmax(score))
+        picked.append(best)
+        np.maximum(redundancy, pairwise[best], out=redundancy)
+    return picked
+
+
+def extract_keywords_batch(queries: list, top_n: int = 5, diversity: float = keyword_diversity) -> list:
+    # All queries and all of their candidates are embedded in two batched encode calls
+    if not queries:
+        return []
+    per_query = [candidates(q) for q in queries]
+    unique = list(dict.fromkeys(c for cands in per_query for c in cands))
+    query_vecs = encode(list(queries))
+    cand_vecs = encode(unique) if unique else np.zeros((0, query_vecs.shape[1]), dtype=np.float32)
+    index = {c: i for i, c in enumerate(unique)}
+
+    results = []
+    for query, query_vec, cands in zip(queries, query_vecs, per_query):
+        keywords = []
+        if cands:
+            vecs = cand_vecs[[index[c] for c in cands]]
+            keywords = [cands[i] for i in mmr(query_vec, vecs, top_n, diversity)]
+        results.append(KeywordOutput(prompt=query, keywords=keywords).model_dump_json())
+    return results
+
+
+def extract_keywords_local(query: str, top_n: int = 5) -> str:
+    return extract_keywords_batch([query], top_n)[0]
@@ -0,0 +1,214 @@
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+import httpx
+import ollama
+
+from query_preprocessing import cancellation
+
+# "" disables hedging; "p95" (any pNN) sends a duplicate to a second instance once a call has
+# outlasted that percentile of recent latencies for its model; a number is a fixed delay in seconds
+hedge_after = os.environ.get('OLLAMA_HEDGE_AFTER', '')
+health_interval_s = float(os.environ.get('OLLAMA_HEALTH_INTERVAL_S', 5))
+# An instance that does not have the model loaded counts as this many extra outstanding requests,
+# so requests stick to warm instances unless those are clearly busier
+affinity_penalty = float(os.environ.get('OLLAMA_AFFINITY_PENALTY', 2))
+
+LATENCY_WINDOW = 200
+MIN_HEDGE_SAMPLES = 20
+
+
+def model_key(model: str) -> str:
+    # Ollama reports "llama3.2" as "llama3.2:latest"
+    return model if ":" in model else f"{model}:latest"
+
+
+def parse_hedge(value):
+    # -> (fixed delay in seconds, percentile); at most one is set
+    value = str(value or "").strip()
+    if not value:
+        return None, None
+    if value.lower().startswith("p"):
+        return None, float(value[1:])
+    return float(value), None
+
+
+class Endpoint:
+    def __init__(self, host):
+        self.host = host
+        self.client = ollama.AsyncClient(host)
+        self.outstanding = 0
+        self.healthy = True
+        self.loaded = set()
+        self.requests = 0
+        self.errors = 0
+
+    def score(self, model):
+        return self.outstanding + (0 if model in self.loaded else affinity_penalty)
+
+    def to_dict(self):
+        return {"host": self.host, "healthy": self.healthy, "outstanding": self.outstanding,
+                "requests": self.requests, "errors": self.errors, "loaded": sorted(self.loaded)}
+
+
+# Backend over several Ollama instances. Each call goes to the healthy instance with the fewest
+# outstanding requests, preferring instances that already have the model loaded. With hedging on,
+# a call still running after the hedge delay is duplicated on a second instance; whichever answers
+# first wins and the other request is cancelled, which closes its connection so Ollama stops
+# generating. All HTTP work runs on one event loop in a background thread, so the sync
+# chat()/generate() interface matches the other backends.
+class OllamaPool:
+    def __init__(self, hosts, hedge_after=hedge_after, health_interval_s=health_interval_s):
+        if not hosts:
+            raise ValueError("OllamaPool needs at least one host")
+        self.hedge_delay_s, self.hedge_percentile = parse_hedge(hedge_after)
+        self.health_interval_s = health_interval_s
+        self.counts = defaultdict(int)
+        self._latency = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="ollama-pool", daemon=True)
+        self._thread.start()
+        self.endpoints = self._submit(self._start(hosts))
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _start(self, hosts):
+        # Clients are created on the pool's loop, which is the only loop that uses them
+        endpoints = [Endpoint(host) for host in hosts]
+        self._health_task = asyncio.ensure_future(self._health_loop(endpoints))
+        return endpoints
+
+    async def _health_loop(self, endpoints):
+        while True:
+            await asyncio.gather(*(self._probe(e) for e in endpoints))
+            await asyncio.sleep(self.health_interval_s)
+
+    async def _probe(self, endpoint):
+        # /api/ps doubles as the liveness check and the list of models currently in memory
+        try:
+            ps = await asyncio.wait_for(endpoint.client.ps(), self.health_interval_s)
+        except Exception:
+            endpoint.healthy = False
+            return
+        endpoint.healthy = True
+        endpoint.loaded = {m.model for m in ps.models if m.model}
+
+    def _pick(self, model, exclude=()):
+        candidates = [e for e in self.endpoints if e not in exclude]
+        # If every instance looks down, try them anyway rather than failing without a request
+        candidates = [e for e in candidates if e.healthy] or candidates
+        if not candidates:
+            return None
+        return min(candidates, key=lambda e: (e.score(model), e.requests))
+
+    def _hedge_delay(self, model):
+        if len(self.endpoints) < 2:
+            return None
+        if self.hedge_delay_s is not None:
+            return self.hedge_delay_s
+        samples = self._latency[model]
+        if self.hedge_percentile is None or len(samples) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(int(len(ordered) * self.hedge_percentile / 100), len(ordered) - 1)]
+
+    async def _attempt(self, endpoint, op, request, model):
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        start = time.perf_counter()
+        try:
+            response = await getattr(endpoint.client, op)(**request)
+        except asyncio.CancelledError:
+            raise
+        except (ConnectionError, httpx.TransportError):
+            endpoint.errors += 1
+            endpoint.healthy = False
+            raise
+        except Exception:
+            endpoint.errors += 1
+            raise
+        finally:
+            endpoint.outstanding -= 1
+        self._latency[model].append(time.perf_counter() - start)
+        endpoint.loaded.add(model)
+        return response
+
+    async def _call(self, op, request):
+        model = model_key(request.get("model", ""))
+        delay = self._hedge_delay(model)
+        tried, hedges, pending = [], set(), set()
+
+        def start(endpoint, hedge=False):
+            tried.append(endpoint)
+            task = asyncio.ensure_future(self._attempt(endpoint, op, request, model))
+            pending.add(task)
+            if hedge:
+                hedges.add(task)
+
+        self.counts["requests"] += 1
+        start(self._pick(model))
+        error = None
+        try:
+            while pending:
+                timeout = delay if len(tried) == 1 else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    backup = self._pick(model, exclude=tried)
+                    if backup is None:
+                        delay = None
+                        continue
+                    self.counts["hedged"] += 1
+                    start(backup, hedge=True)
+                    continue
+                for task in done:
+                    if task.exception() is None:
+                        if task in hedges:
+                            self.counts["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+                # Fail over once to an instance that has not been tried
+                if not pending and len(tried) == 1:
+                    backup = self._pick(model, exclude=tried)
+                    if backup is not None:
+                        self.counts["failovers"] += 1
+                        start(backup)
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+                self.counts["cancelled"] += 1
+
+    def _run(self, op, request):
+        future = asyncio.run_coroutine_threadsafe(self._call(op, request), self._loop)
+        token = cancellation.current()
+        if token is None:
+            return future.result()
+        # Cancelling the future cancels every attempt's task, which drops their connections
+        token.add_callback(future.cancel)
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            raise cancellation.Cancelled(token.reason) from None
+
+    def chat(self, **request):
+        return self._run("chat", request)
+
+    def generate(self, **request):
+        return self._run("generate", request)
+
+    def stats(self) -> dict:
+        return {**self.counts, "endpoints": [e.to_dict() for e in self.endpoints]}
+
+    def close(self):
+        async def stop():
+            self._health_task.cancel()
+            for endpoint in self.endpoints:
+                await endpoint.client._client.aclose()
+        self._submit(stop())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
@@ -1,9 +1,11 @@
 
 import json
 import sys
-import ollama
 from sklearn.metrics import precision_score, recall_score, accuracy_score
 
+from evaluations.bootstrap_stats import bootstrap_classification, format_ci, format_paired, paired_classification_test
+from query_preprocessing.llmBackend import get_backend
+
 def chat(model, prompt):
     messages = [
         {
@@ -19,7 +21,7 @@ def chat(model, prompt):
             "content": prompt
         }
     ]
-    response = ollama.chat(model=model, messages=messages)
+    response = get_backend().chat(model=model, messages=messages)
     content = response['message']['content'].strip().lower()
 
     if content.startswith("yes") or content.startswith("Yes"):
@@ -33,8 +35,10 @@ def chat(model, prompt):
 if __name__ == "__main__":
     model_name = sys.argv[1]
     json_path = sys.argv[2]
+    baseline_name = sys.argv[3] if len(sys.argv) > 3 else None # optional model to compare against
     truth = [] # ground truth list
     modelAnswers = [] # model's answer list
+    pairedTruth, pairedAnswers, baselineAnswers = [], [], [] # items both models answered
 
     with open(json_path, 'r') as f:
         data = json.load(f)
@@ -55,6 +59,22 @@ if __name__ == "__main__":
         truth.append(label)
         modelAnswers.append(answer)
 
+        if baseline_name:
+            baseline = chat(baseline_name, item['prompt'])
+            if baseline != -1:
+                pairedTruth.append(label)
+                pairedAnswers.append(answer)
+                baselineAnswers.append(baseline)
+
     print(f"Accuracy:  {accuracy_score(truth, modelAnswers):.2f}")
     print(f"Precision: {precision_score(truth, modelAnswers):.2f}")
     print(f"Recall:    {recall_score(truth, modelAnswers):.2f}")
+
+    print("\nBootstrap CIs:")
+    for name, r in bootstrap_classification(truth, modelAnswers).items():
+        print(format_ci(name, r))
+
+    if baseline_name:
+        print(f"\n{model_name} - {baseline_name}, paired on items both answered:")
+        for name, r in paired_classification_test(pairedTruth, pairedAnswers, baselineAnswers).items():
+            print(format_paired(name, r))
@@ -1,8 +1,7 @@
-import ollama
 from outlines import from_ollama, Generator
 from outlines.types import JsonSchema
-from pydantic import BaseModel
-from typing import List
+from query_preprocessing.llmBackend import BackendClient, get_backend
+from query_preprocessing.structuredOutput import StructuredOutput
 
 decompSys = """You are the decomposition module for a construction-contract Q&A pipeline.
 
@@ -126,15 +125,8 @@ fewshotDecomp = [
 ]
 
 
-class StructuredOutput(BaseModel):
-    context: List[str]
-    queries: List[str]
-    directives: List[str]
-    noise: List[str]
-
-
 def generate_decomposition(model_name: str, user_prompt: str):
-    client = ollama.Client()
+    client = BackendClient(get_backend())
     base_model = from_ollama(client, model_name)
 
     generator = Generator(base_model, StructuredOutput)
@@ -1,6 +1,7 @@
 import json
 import sys
-import ollama
+
+from query_preprocessing.llmBackend import get_backend
 
 SYS_PROMPT = (
     "You are a prompt-decomposition assistant for a construction Q&A system.\n\n"
@@ -131,7 +132,7 @@ FEWSHOT = [
 
 
 def call_llama(model: str, messages: list) -> str:
-    return ollama.chat(
+    return get_backend().chat(
         model=model,
         messages=messages,
         options={"temperature": 0},
@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+import uuid
+from array import array
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from query_preprocessing.fullAgentImplementation import decompSys, fewshotDecomp, decompose
+from query_preprocessing.llmBackend import get_backend
+from query_preprocessing.structuredOutput import StructuredOutput, StructuredOutputError, parse_structured
+
+session_ttl_s = float(os.environ.get('SESSION_TTL_S', 30 * 60))
+max_sessions = int(os.environ.get('SESSION_MAX', 1000))
+max_turns = int(os.environ.get('SESSION_MAX_TURNS', 8))
+# Past this many tokens the Ollama context is dropped and the next turn starts from the system prompt
+max_context_tokens = int(os.environ.get('SESSION_MAX_CONTEXT_TOKENS', 6000))
+
+FOLLOW_UP_NOTE = (
+    "Follow-up turn in the same conversation. Decompose this prompt with the same schema. "
+    "Rewrite any query that refers to an earlier turn (\"that\", \"it\", \"further\") into a "
+    "stand-alone question using the earlier queries.\n"
+    "Earlier queries: {queries}\n\n"
+)
+
+
+@dataclass
+class Turn:
+    prompt: str
+    decomposition: dict
+    resolved_queries: list
+
+
+@dataclass
+class Session:
+    id: str
+    last_used: float = field(default_factory=time.monotonic)
+    turns: deque = field(default_factory=lambda: deque(maxlen=max_turns))
+    # Ollama `context` tokens per model: the KV state after the last turn, reused by the next one.
+    # Kept as array('i') (4 bytes per token) rather than a list of boxed ints.
+    context: dict = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def last_queries(self) -> list:
+        for turn in reversed(self.turns):
+            if turn.resolved_queries:
+                return turn.resolved_queries
+        return []
+
+
+class SessionStore:
+    def __init__(self, ttl_s=session_ttl_s, max_sessions=max_sessions):
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_used <= self.ttl_s and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+
+    def get(self, session_id: Optional[str]) -> Session:
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = Session(session_id or uuid.uuid4().hex)
+                self._sessions[session.id] = session
+            session.last_used = now
+            self._sessions.move_to_end(session.id)
+            self._evict(now)
+            return session
+
+    def drop(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+store = SessionStore()
+
+
+def fewshot_block() -> str:
+    block = ""
+    for msg in fewshotDecomp:
+        prefix = "User: " if msg["role"] == "user" else ""
+        block += f"{prefix}{msg['content'].strip()}\n"
+    return block
+
+
+def generate_turn(model: str, session: Session, prompt: str):
+    # First turn sends the system prompt and few-shot examples once; later turns send only the new
+    # prompt plus the previous `context`, so Ollama continues from that state instead of
+    # re-evaluating the whole preamble.
+    context = session.context.get(model)
+    if context:
+        text = FOLLOW_UP_NOTE.format(queries=session.last_queries()) + f"User: {prompt}"
+        kwargs = {"context": context.tolist()}
+    else:
+        text = f"{fewshot_block()}\nUser: {prompt}"
+        kwargs = {"system": decompSys}
+    response = get_backend().generate(
+        model=model,
+        prompt=text,
+        format=StructuredOutput.model_json_schema(),
+        options={"temperature": 0},
+        think=False,
+        **kwargs,
+    )
+    return response["response"], response.get("context"), bool(context)
+
+
+def decompose_turn(model: str, prompt: str, session_id: Optional[str] = None) -> dict:
+    session = store.get(session_id)
+    with session.lock:
+        raw, context, reused = generate_turn(model, session, prompt)
+        try:
+            decomp = parse_structured(raw, StructuredOutput)[0].model_dump()
+        except StructuredOutputError:
+            # Fall back to a fresh, stateless decomposition and restart the session's context
+            decomp, context, reused = decompose(model, prompt), None, False
+
+        if context and len(context) <= max_context_tokens:
+            session.context[model] = array("i", context)
+        else:
+            session.context.pop(model, None)
+
+        # A directive-only follow-up ("Put that in a table") applies to the previous queries,
+        # which are reused as-is instead of being decomposed again
+        queries = (decomp or {}).get("queries") or []
+        reused_queries = not queries and bool((decomp or {}).get("directives")) and bool(session.last_queries())
+        resolved = session.last_queries() if reused_queries else queries
+
+        session.turns.append(Turn(prompt, decomp, resolved))
+        return {
+            "sessionId": session.id,
+            "decomposition": decomp,
+            "resolvedQueries": resolved,
+            "reusedContext": reused,
+            "reusedQueries": reused_queries,
+        }
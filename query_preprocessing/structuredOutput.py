@@ -0,0 +1,138 @@
+import ast
+import json
+import re
+import threading
+from typing import Callable, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+from query_preprocessing import tracing
+
+
+class StructuredOutput(BaseModel):
+    context: List[str]
+    queries: List[str]
+    directives: List[str]
+    noise: List[str]
+
+
+class KeywordOutput(BaseModel):
+    prompt: str
+    keywords: List[str]
+
+
+class StructuredOutputError(ValueError):
+    def __init__(self, schema: Type[BaseModel], raw: str, cause: Exception):
+        super().__init__(f"Could not parse {schema.__name__} from model output: {cause}")
+        self.raw = raw
+        self.cause = cause
+
+
+THINK_RE = re.compile(r"<think>.*?</think>", re.DOTALL)
+FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.MULTILINE)
+TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"'})
+
+
+def outermost_object(text: str) -> str:
+    start, end = text.find("{"), text.rfind("}")
+    return text[start:end + 1] if start != -1 and end > start else text
+
+
+def repair_candidates(raw: str):
+    # Cheap local fixes for near-valid JSON, cheapest first; each is tried before re-asking the model
+    text = FENCE_RE.sub("", THINK_RE.sub("", raw)).strip()
+    text = outermost_object(text)
+    yield text
+    text = TRAILING_COMMA_RE.sub(r"\1", text.translate(SMART_QUOTES))
+    yield text
+    # Single-quoted / Python-literal dicts
+    try:
+        literal = ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return
+    if isinstance(literal, dict):
+        yield json.dumps(literal)
+
+
+def parse_structured(raw: str, schema: Type[BaseModel]):
+    # Returns (instance, repaired); raises StructuredOutputError if no candidate validates
+    with tracing.span("parse", "parse", schema=schema.__name__) as sp:
+        try:
+            return schema.model_validate_json(raw), False
+        except ValidationError as e:
+            error = e
+        sp.set(repaired=True)
+        for candidate in repair_candidates(raw):
+            try:
+                return schema.model_validate_json(candidate), True
+            except ValidationError as e:
+                error = e
+        raise StructuredOutputError(schema, raw, error)
+
+
+class StructuredStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.calls = 0          # stage invocations
+        self.llm_calls = 0      # requests sent to the model, including re-asks
+        self.parse_failures = 0 # first responses that were not valid JSON for the schema
+        self.repaired = 0       # ... of which the local repair pass fixed
+        self.reasks = 0
+        self.failures = 0       # gave up after re-asking
+
+    def record(self, **counts):
+        with self._lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def summary(self) -> dict:
+        with self._lock:
+            calls = self.calls or 1
+            return {
+                "calls": self.calls,
+                "llm_calls": self.llm_calls,
+                "parse_failure_rate": self.parse_failures / calls,
+                "repaired": self.repaired,
+                "reask_rate": self.reasks / calls,
+                "failure_rate": self.failures / calls,
+            }
+
+
+stats = StructuredStats()
+
+
+def structured_chat(chat: Callable, model: str, messages: list, schema: Type[BaseModel],
+                    max_reasks: int = 1) -> Optional[BaseModel]:
+    # `chat(model, messages, format=...)` is sent the schema so Ollama constrains decoding to it.
+    # Near-valid output is repaired locally; only if that fails is the model asked again.
+    fmt = schema.model_json_schema()
+    stats.record(calls=1)
+    msgs = list(messages)
+    for attempt in range(max_reasks + 1):
+        raw = chat(model, msgs, format=fmt)
+        stats.record(llm_calls=1)
+        try:
+            result, repaired = parse_structured(raw, schema)
+        except StructuredOutputError as e:
+            if attempt == 0:
+                stats.record(parse_failures=1)
+            if attempt == max_reasks:
+                stats.record(failures=1)
+                return None
+            stats.record(reasks=1)
+            msgs = msgs + [
+                {"role": "assistant", "content": raw},
+                {"role": "user", "content": (
+                    f"That reply was not valid JSON for the required schema ({e.cause}). "
+                    "Reply again with only the JSON object."
+                )},
+            ]
+            continue
+        if attempt == 0 and repaired:
+            stats.record(parse_failures=1, repaired=1)
+        return result
+    return None
@@ -0,0 +1,54 @@
+import json
+import sys
+
+from query_preprocessing import structuredOutput
+from query_preprocessing.fullAgentImplementation import (
+    chat, decompSys, fewshotDecomp, keywordSys, fewshotKeyword, decompose, extract_keywords,
+)
+
+
+def stage_messages(system, fewshot, content):
+    return [{"role": "system", "content": system}, *fewshot, {"role": "user", "content": content}]
+
+
+def before(model: str, prompts: list) -> dict:
+    # Previous behaviour: free-form generation, a single json.loads, no repair and no re-ask
+    counts = {"calls": 0, "failures": 0}
+    for prompt in prompts:
+        for system, fewshot in ((decompSys, fewshotDecomp), (keywordSys, fewshotKeyword)):
+            counts["calls"] += 1
+            try:
+                json.loads(chat(model, stage_messages(system, fewshot, prompt)))
+            except json.JSONDecodeError:
+                counts["failures"] += 1
+    return {"calls": counts["calls"], "parse_failure_rate": counts["failures"] / max(counts["calls"], 1),
+            "reask_rate": 0.0, "failure_rate": counts["failures"] / max(counts["calls"], 1)}
+
+
+def after(model: str, prompts: list) -> dict:
+    structuredOutput.stats.reset()
+    for prompt in prompts:
+        decompose(model, prompt)
+        extract_keywords(model, prompt)
+    return structuredOutput.stats.summary()
+
+
+def main(argv):
+    if len(argv) < 2:
+        print("Usage: python -m query_preprocessing.structuredOutputReport <model_name> <prompts.json> [...]")
+        sys.exit(1)
+
+    model_name, paths = argv[0], argv[1:]
+    print("| Prompt set | Mode | Stage calls | Parse failures | Re-asks | Unrecovered |")
+    print("|---|---|---|---|---|---|")
+    for path in paths:
+        with open(path) as fh:
+            prompts = [row["prompt"] for row in json.load(fh)]
+        for mode, run in (("before", before), ("after", after)):
+            r = run(model_name, prompts)
+            print(f"| {path} | {mode} | {r['calls']} | {r['parse_failure_rate']:.1%} "
+                  f"| {r['reask_rate']:.1%} | {r['failure_rate']:.1%} |")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
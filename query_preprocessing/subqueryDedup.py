@@ -0,0 +1,89 @@
+import importlib.util
+import os
+import re
+
+import numpy as np
+
+# Subqueries at least this cosine-similar to a cluster's representative are collapsed into it.
+# 1 (or more) only collapses identical text and never loads the embedding model.
+dedup_threshold = float(os.environ.get('SUBQUERY_DEDUP_THRESHOLD', 0.85))
+
+NUMBERED_RE = re.compile(r"^\s*\d+\.\s+(.*)$")
+
+
+def numbered_items(text: str) -> list:
+    matches = (NUMBERED_RE.match(line) for line in (text or "").splitlines())
+    return [m.group(1).strip() for m in matches if m]
+
+
+def normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^\w$%.\s]", " ", text.lower()).split())
+
+
+def cluster(vecs, threshold):
+    # Leader clustering on the full similarity matrix: in input order, each unassigned subquery
+    # becomes a representative and absorbs every unassigned subquery within the threshold of it.
+    # Unlike connected components this never chains A~B~C into one cluster when A and C differ.
+    sim = vecs @ vecs.T
+    labels = np.full(len(vecs), -1)
+    for i in range(len(vecs)):
+        if labels[i] == -1:
+            labels[(labels == -1) & (sim[i] >= threshold)] = i
+            labels[i] = i
+    return labels
+
+
+_embedder = None
+
+
+def embedder_available() -> bool:
+    # sentence-transformers is optional; without it only identical text is collapsed
+    global _embedder
+    if _embedder is None:
+        _embedder = importlib.util.find_spec("sentence_transformers") is not None
+        if not _embedder:
+            print("subqueryDedup: sentence-transformers is not installed, collapsing identical subqueries only")
+    return _embedder
+
+
+def dedup(pairs, threshold=dedup_threshold) -> list:
+    # pairs: (originating query, subquery). Returns one probe per cluster, in first-seen order:
+    # {"subquery": representative, "queries": originating queries, "duplicates": collapsed texts}
+    pairs = [(q, s.strip()) for q, s in pairs if s and s.strip()]
+    # Identical text (up to case and punctuation) is merged before anything is embedded
+    unique, index = [], {}
+    for _, s in pairs:
+        key = normalize(s)
+        if key not in index:
+            index[key] = len(unique)
+            unique.append(s)
+
+    if threshold < 1 and len(unique) > 1 and embedder_available():
+        from query_preprocessing.localKeywords import encode
+        labels = cluster(encode(unique), threshold)
+    else:
+        labels = np.arange(len(unique))
+
+    probes = {}
+    for query, s in pairs:
+        rep = unique[labels[index[normalize(s)]]]
+        probe = probes.setdefault(rep, {"subquery": rep, "queries": [], "duplicates": []})
+        if query not in probe["queries"]:
+            probe["queries"].append(query)
+        if s != rep and s not in probe["duplicates"]:
+            probe["duplicates"].append(s)
+    return list(probes.values())
+
+
+def subquery_pairs(queries: list, subqueries: list, directSubqueries: list) -> list:
+    # (originating query, subquery) for every subquery of one prompt, from both planners
+    pairs = []
+    for query, planned, direct in zip(queries or [], subqueries or [], directSubqueries or []):
+        pairs += [(query, s) for s in numbered_items(planned)]
+        pairs += [(query, s) for s in (direct or {}).get("subqueries", [])]
+    return pairs
+
+
+def dedup_subqueries(queries: list, subqueries: list, directSubqueries: list, threshold=dedup_threshold) -> list:
+    # Graph stage: all of a prompt's subqueries are embedded in one batch
+    return dedup(subquery_pairs(queries, subqueries, directSubqueries), threshold)
@@ -0,0 +1,47 @@
+import argparse
+import asyncio
+import json
+
+from query_preprocessing.fullAgentImplementation import run_prompts
+from query_preprocessing.llmBackend import ReplayBackend, set_backend
+from query_preprocessing.subqueryDedup import dedup_subqueries, subquery_pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval probes removed by subquery dedup, per prompt set and threshold")
+    parser.add_argument("prompt_files", nargs="+")
+    parser.add_argument("--model", default="qwen3:4b")
+    parser.add_argument("--recording", default=None, help="replay LLM calls from a recording instead of live Ollama")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[1.0, 0.95, 0.9, 0.85, 0.8])
+    parser.add_argument("--show", type=int, default=0, help="print this many example clusters per set")
+    args = parser.parse_args()
+
+    if args.recording:
+        set_backend(ReplayBackend(args.recording, "zero"))
+
+    print("| Prompt set | Threshold | Subqueries | Probes | Removed |")
+    print("|---|---|---|---|---|")
+    examples = []
+    for path in args.prompt_files:
+        with open(path) as fh:
+            prompts = [row["prompt"] for row in json.load(fh)]
+        # The same stage function the graph's "probes" node runs, at each threshold
+        stages = [(out["queries"], out["subqueries"], out["directSubqueries"])
+                  for out in asyncio.run(run_prompts(args.model, prompts))]
+        total = sum(len(subquery_pairs(*stage)) for stage in stages)
+        for threshold in args.thresholds:
+            probes = [dedup_subqueries(*stage, threshold=threshold) for stage in stages]
+            kept = sum(len(p) for p in probes)
+            removed = total - kept
+            print(f"| {path} | {threshold} | {total} | {kept} | {removed} ({removed / max(total, 1):.1%}) |")
+            if threshold == args.thresholds[-1]:
+                examples += [p for ps in probes for p in ps if p["duplicates"]][:args.show]
+
+    for probe in examples:
+        print(f"\n{probe['subquery']}  <- {probe['queries']}")
+        for duplicate in probe["duplicates"]:
+            print(f"    = {duplicate}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Set TRACE_EXPORT to a path to append every finished request's spans there as JSON lines
+trace_export = os.environ.get('TRACE_EXPORT')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.buckets = name, help, buckets
+        self.series = defaultdict(lambda: [[0] * (len(buckets) + 1), 0.0, 0])  # bucket counts, sum, count
+
+    def observe(self, value, labels):
+        series = self.series[labels]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{label_text(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_sum{label_text(labels)} {total}")
+            lines.append(f"{self.name}_count{label_text(labels)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name, self.help = name, help
+        self.series = defaultdict(float)
+
+    def observe(self, value, labels):
+        self.series[labels] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{label_text(labels)} {value}" for labels, value in sorted(self.series.items())]
+        return lines
+
+
+def label_text(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+METRICS = {m.name: m for m in (
+    Histogram("request_latency_seconds", "End-to-end latency per API route"),
+    Histogram("stage_latency_seconds", "Latency per preprocessing stage call, including queue wait"),
+    Histogram("stage_queue_wait_seconds", "Time a ready stage call waited for a concurrency slot"),
+    Histogram("llm_latency_seconds", "Wall time per LLM call"),
+    Histogram("llm_server_duration_seconds", "Ollama-reported total_duration per LLM call"),
+    Histogram("parse_latency_seconds", "Time spent parsing/repairing structured LLM output"),
+    Counter("llm_prompt_tokens_total", "Prompt tokens evaluated (Ollama prompt_eval_count)"),
+    Counter("llm_eval_tokens_total", "Tokens generated (Ollama eval_count)"),
+    Counter("llm_cancelled_total", "LLM calls stopped because the client disconnected"),
+    Counter("llm_cancelled_generated_tokens_total", "Tokens streamed by cancelled calls before they stopped"),
+    Counter("llm_cancelled_tokens_saved_total", "Estimated tokens not generated thanks to cancellation"),
+)}
+_metrics_lock = threading.Lock()
+
+# Which histogram a finished span of each kind feeds, and which attributes become labels
+SPAN_METRICS = {
+    "route": ("request_latency_seconds", ("route",)),
+    "stage": ("stage_latency_seconds", ("stage",)),
+    "llm": ("llm_latency_seconds", ("model", "op")),
+    "parse": ("parse_latency_seconds", ("schema",)),
+}
+
+
+def observe(metric, value, **labels):
+    with _metrics_lock:
+        METRICS[metric].observe(value, tuple(sorted(labels.items())))
+
+
+def render_metrics() -> str:
+    with _metrics_lock:
+        lines = [line for metric in METRICS.values() for line in metric.render()]
+    return "\n".join(lines) + "\n"
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start", "duration", "attrs")
+
+    def __init__(self, name, kind, trace_id, parent_id, attrs):
+        self.name, self.kind, self.trace_id, self.parent_id, self.attrs = name, kind, trace_id, parent_id, attrs
+        self.span_id = uuid.uuid4().hex[:16]
+        self.start = time.time()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        return {s: getattr(self, s) for s in self.__slots__}
+
+
+class Trace:
+    def __init__(self, route):
+        self.id = uuid.uuid4().hex
+        self.route = route
+        self.spans = []
+
+
+_trace: ContextVar = ContextVar("trace", default=None)
+_span: ContextVar = ContextVar("span", default=None)
+
+
+@contextmanager
+def span(name, kind="internal", **attrs):
+    trace, parent = _trace.get(), _span.get()
+    s = Span(name, kind, trace.id if trace else None, parent.span_id if parent else None, attrs)
+    token = _span.set(s)
+    start = time.perf_counter()
+    try:
+        yield s
+    except BaseException as e:
+        s.attrs["error"] = repr(e)
+        raise
+    finally:
+        s.duration = time.perf_counter() - start
+        _span.reset(token)
+        if trace:
+            trace.spans.append(s)
+        if kind in SPAN_METRICS:
+            metric, label_names = SPAN_METRICS[kind]
+            observe(metric, s.duration, **{k: s.attrs.get(k, "") for k in label_names})
+
+
+@contextmanager
+def trace(route):
+    # One trace per request; spans opened underneath it (in tasks or worker threads that copy the
+    # context) are collected and exported together when the request finishes
+    t = Trace(route)
+    token = _trace.set(t)
+    try:
+        with span(route, "route", route=route) as root:
+            yield root
+    finally:
+        _trace.reset(token)
+        if trace_export:
+            export(t, trace_export)
+
+
+_export_lock = threading.Lock()
+
+
+def export(t: Trace, path: str):
+    lines = "".join(json.dumps(s.to_dict(), default=str) + "\n" for s in t.spans)
+    with _export_lock, open(path, "a") as f:
+        f.write(lines)
+
+
+def record_llm_response(s: Span, response):
+    # Ollama reports durations in nanoseconds
+    model = s.attrs.get("model", "")
+    prompt_tokens = response.get("prompt_eval_count") or 0
+    eval_tokens = response.get("eval_count") or 0
+    total = (response.get("total_duration") or 0) / 1e9
+    s.set(prompt_eval_count=prompt_tokens, eval_count=eval_tokens, total_duration=total,
+          load_duration=(response.get("load_duration") or 0) / 1e9)
+    observe("llm_prompt_tokens_total", prompt_tokens, model=model)
+    observe("llm_eval_tokens_total", eval_tokens, model=model)
+    if total:
+        observe("llm_server_duration_seconds", total, model=model)
+
+
+def fold(paths):
+    # Collapsed-stack lines ("route;stage;llm.chat <microseconds>") for flamegraph.pl / speedscope,
+    # counting each span's self time
+    spans = {}
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                s = json.loads(line)
+                spans[s["span_id"]] = s
+    child_time = defaultdict(float)
+    for s in spans.values():
+        if s["parent_id"]:
+            child_time[s["parent_id"]] += s["duration"]
+    folded = defaultdict(float)
+    for s in spans.values():
+        stack, node = [], s
+        while node:
+            stack.append(node["name"])
+            node = spans.get(node["parent_id"])
+        folded[";".join(reversed(stack))] += max(s["duration"] - child_time[s["span_id"]], 0)
+    for stack, seconds in sorted(folded.items()):
+        print(f"{stack} {int(seconds * 1e6)}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "fold":
+        print("Usage: python -m query_preprocessing.tracing fold <traces.jsonl> [...]")
+        sys.exit(1)
+    fold(sys.argv[2:])
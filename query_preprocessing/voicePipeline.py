@@ -0,0 +1,71 @@
+import asyncio
+
+from query_preprocessing import cancellation
+from query_preprocessing.fullAgentImplementation import decompose
+from voice_to_text.streaming import StreamingTranscriber, WavStreamDecoder
+
+
+async def read_header(chunks, decoder: WavStreamDecoder):
+    # Pull upload chunks until the WAV header is parsed; raises ValueError on non-WAV input
+    samples = []
+    async for data in chunks:
+        samples.append(decoder.feed(data))
+        if decoder.header_done:
+            break
+    return samples
+
+
+async def voice_decomposition_events(model: str, chunks, decoder: WavStreamDecoder, initial=()):
+    # Three overlapping stages: reading the upload, transcribing VAD segments, and decomposing
+    # each finished segment. Events are yielded as soon as any stage produces them.
+    audio_q: asyncio.Queue = asyncio.Queue(maxsize=32)
+    events: asyncio.Queue = asyncio.Queue()
+    pending = []
+
+    async def read_upload():
+        for samples in initial:
+            await audio_q.put(samples)
+        async for data in chunks:
+            await audio_q.put(decoder.feed(data))
+        await audio_q.put(None)
+
+    async def decompose_segment(index: int, text: str):
+        result = await asyncio.to_thread(decompose, model, text)
+        await events.put({"type": "decomposition", "segment": index, "text": text, "decomposition": result})
+
+    def emit(segments):
+        for seg in segments:
+            index = len(pending)
+            events.put_nowait({"type": "transcript", "segment": index, **seg})
+            pending.append(asyncio.create_task(decompose_segment(index, seg["text"])) if seg["text"] else None)
+
+    async def transcribe():
+        transcriber = await asyncio.to_thread(StreamingTranscriber)
+        while (samples := await audio_q.get()) is not None:
+            if len(samples):
+                emit(await asyncio.to_thread(transcriber.feed, samples))
+        emit(await asyncio.to_thread(transcriber.flush))
+
+    async def run():
+        try:
+            await asyncio.gather(read_upload(), transcribe())
+            await asyncio.gather(*[t for t in pending if t])
+        except Exception as e:
+            await events.put({"type": "error", "detail": str(e)})
+        finally:
+            await events.put(None)
+
+    runner = asyncio.create_task(run())
+    token = cancellation.current()
+    if token is not None:
+        # A disconnected client stops transcription and the decompositions still running
+        loop = asyncio.get_running_loop()
+        token.add_callback(lambda: loop.call_soon_threadsafe(runner.cancel))
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+    finally:
+        runner.cancel()
+        for task in pending:
+            if task:
+                task.cancel()
@@ -1,12 +1,87 @@
+import argparse
+import json
+import os
+import torch
+import transformers
 from transformers import WhisperTokenizer, WhisperProcessor, AutoModelForSpeechSeq2Seq
 
+from voice_to_text.inference import MANIFEST
+
 model_name = "openai/whisper-base"
 save_directory = "./whisper_model"
 
-model = AutoModelForSpeechSeq2Seq.from_pretrained(model_name)
-tokenizer = WhisperTokenizer.from_pretrained(model_name)
-processor = WhisperProcessor.from_pretrained(model_name)
 
-model.save_pretrained(save_directory)
-tokenizer.save_pretrained(save_directory)
-processor.save_pretrained(save_directory)
+def save_hf(model_name, save_directory):
+    model = AutoModelForSpeechSeq2Seq.from_pretrained(model_name)
+    tokenizer = WhisperTokenizer.from_pretrained(model_name)
+    processor = WhisperProcessor.from_pretrained(model_name)
+
+    model.save_pretrained(save_directory)
+    tokenizer.save_pretrained(save_directory)
+    processor.save_pretrained(save_directory)
+
+
+def export_onnx(model_name, bundle_directory):
+    # Encoder, decoder and decoder-with-past graphs exported ahead of time through optimum
+    from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+    import onnxruntime
+    ORTModelForSpeechSeq2Seq.from_pretrained(model_name, export=True, use_cache=True).save_pretrained(bundle_directory)
+    return onnxruntime.__version__
+
+
+def save_bundle(model_name, bundle_directory, onnx=True):
+    # Startup-friendly layout for inference.model_fn, marked by a manifest: one unsharded
+    # safetensors file that loads by mmap, the exported ONNX graphs (unless onnx=False), and
+    # the processor files. The loader prefers the graphs and falls back to the weights.
+    processor = WhisperProcessor.from_pretrained(model_name)
+    model = AutoModelForSpeechSeq2Seq.from_pretrained(model_name)
+    model.save_pretrained(bundle_directory, safe_serialization=True, max_shard_size="100GB")
+    onnxruntime_version = export_onnx(model_name, bundle_directory) if onnx else None
+    processor.save_pretrained(bundle_directory)
+
+    manifest = {
+        "format": "whisper-asr-bundle",
+        "version": 3,
+        "model_name": model_name,
+        "model_class": type(model).__name__,
+        "weights": "model.safetensors",
+        "graphs": sorted(f for f in os.listdir(bundle_directory) if f.endswith(".onnx")),
+        "dtype": str(model.dtype).replace("torch.", ""),
+        "parameters": sum(p.numel() for p in model.parameters()),
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "onnxruntime": onnxruntime_version,
+    }
+    with open(os.path.join(bundle_directory, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def convert_ct2(save_directory, ct2_directory, quantization="int8"):
+    # CTranslate2 model for the faster-whisper CPU backend (backends.FasterWhisperBackend)
+    import ctranslate2
+
+    converter = ctranslate2.converters.TransformersConverter(
+        save_directory,
+        copy_files=["tokenizer.json", "preprocessor_config.json"],
+    )
+    converter.convert(ct2_directory, quantization=quantization, force=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model_name", default=model_name)
+    parser.add_argument("--save_directory", default=save_directory)
+    parser.add_argument("--skip_hf", action="store_true", help="don't write the plain save_pretrained model to --save_directory")
+    parser.add_argument("--bundle_directory", default=None)
+    parser.add_argument("--bundle_no_onnx", action="store_true", help="bundle the safetensors weights only, without ONNX graphs")
+    parser.add_argument("--ct2_directory", default=None)
+    parser.add_argument("--quantization", default="int8")
+    args = parser.parse_args()
+
+    # The CTranslate2 converter reads the plain model, so --ct2_directory always writes it
+    if not args.skip_hf or args.ct2_directory:
+        save_hf(args.model_name, args.save_directory)
+    if args.bundle_directory:
+        save_bundle(args.model_name, args.bundle_directory, onnx=not args.bundle_no_onnx)
+    if args.ct2_directory:
+        convert_ct2(args.save_directory, args.ct2_directory, args.quantization)
@@ -0,0 +1,108 @@
+import os
+import struct
+import sys
+from math import gcd
+
+import numpy as np
+import soundfile as sf
+
+SAMPLE_RATE = 16000
+# PCM WAVs at least this large are memory-mapped instead of read into a fresh buffer
+MMAP_MIN_BYTES = int(os.environ.get('AUDIO_MMAP_MIN_BYTES', 32 * 1024 * 1024))
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def parse_wav_header(buf):
+    # Returns the layout of a RIFF/WAVE byte prefix, or None until the data chunk header is in `buf`
+    if len(buf) < 12:
+        return None
+    if buf[:4] != b"RIFF" or buf[8:12] != b"WAVE":
+        raise ValueError("Not a RIFF/WAVE file")
+    layout = {}
+    pos = 12
+    while pos + 8 <= len(buf):
+        chunk_id, size = struct.unpack("<4sI", buf[pos:pos + 8])
+        if chunk_id == b"fmt ":
+            if pos + 8 + size > len(buf):
+                return None
+            fmt, channels, rate, _, _, bits = struct.unpack("<HHIIHH", buf[pos + 8:pos + 24])
+            if fmt == WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                fmt = struct.unpack("<H", buf[pos + 32:pos + 34])[0]
+            if (fmt, bits) == (WAVE_FORMAT_PCM, 16):
+                dtype = np.dtype("<i2")
+            elif (fmt, bits) == (WAVE_FORMAT_IEEE_FLOAT, 32):
+                dtype = np.dtype("<f4")
+            else:
+                raise ValueError(f"Unsupported WAV encoding (format {fmt}, {bits} bit)")
+            layout.update(channels=channels, sample_rate=rate, dtype=dtype)
+        elif chunk_id == b"data":
+            if not layout:
+                raise ValueError("WAV data chunk before fmt chunk")
+            layout.update(data_offset=pos + 8, data_size=size)
+            return layout
+        pos += 8 + size + (size & 1)
+    return None
+
+
+def to_mono_float32(frames, dtype):
+    # frames: (n, channels) in the file's sample type
+    audio = frames[:, 0] if frames.shape[1] == 1 else frames.mean(axis=1)
+    audio = audio.astype(np.float32, copy=False)
+    if dtype.kind == "i":
+        audio = audio / np.float32(32768.0)
+    return audio
+
+
+def _mmap_wav(path):
+    with open(path, "rb") as f:
+        head = f.read(4096)
+    try:
+        layout = parse_wav_header(head)
+    except ValueError:
+        return None
+    if layout is None:
+        return None
+    file_size = os.path.getsize(path)
+    frame_bytes = layout["dtype"].itemsize * layout["channels"]
+    data_size = min(layout["data_size"], file_size - layout["data_offset"])
+    frames = np.memmap(path, dtype=layout["dtype"], mode="r", offset=layout["data_offset"],
+                       shape=(data_size // frame_bytes, layout["channels"]))
+    return to_mono_float32(frames, layout["dtype"]), layout["sample_rate"]
+
+
+def read_audio(path):
+    # Mono float32 at the file's own sample rate, decoded in-process
+    if os.path.getsize(path) >= MMAP_MIN_BYTES:
+        mapped = _mmap_wav(path)
+        if mapped is not None:
+            return mapped
+    frames, rate = sf.read(path, dtype="float32", always_2d=True)
+    return to_mono_float32(frames, frames.dtype), rate
+
+
+def resample(audio, orig_sr, target_sr=SAMPLE_RATE):
+    if orig_sr == target_sr:
+        return audio
+    from scipy.signal import resample_poly
+    g = gcd(orig_sr, target_sr)
+    return resample_poly(audio, target_sr // g, orig_sr // g).astype(np.float32)
+
+
+def load_audio(path, sr=SAMPLE_RATE):
+    # Same contract as whisper.load_audio (mono float32 at `sr`) without spawning ffmpeg.
+    # Formats libsndfile cannot read still fall back to whisper's ffmpeg path.
+    try:
+        audio, rate = read_audio(path)
+    except sf.LibsndfileError:
+        import whisper
+        return whisper.load_audio(path, sr=sr)
+    return resample(audio, rate, sr)
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        audio = load_audio(path)
+        print(f"{path}: {len(audio) / SAMPLE_RATE:.2f}s, peak {np.abs(audio).max():.3f}")
@@ -0,0 +1,132 @@
+import os
+
+from voice_to_text import audio_io
+from voice_to_text.model_registry import default_device, get_model, registry
+
+SAMPLE_RATE = 16000
+backend_name = os.environ.get('ASR_BACKEND', 'whisper')
+
+
+def load_audio(audio):
+    # Paths are decoded in-process to 16 kHz mono float32, so model.transcribe never spawns
+    # ffmpeg; arrays are assumed to already be in that form
+    if isinstance(audio, str):
+        return audio_io.load_audio(audio, sr=SAMPLE_RATE)
+    return audio
+
+
+def segment_dict(start, end, text):
+    return {"start": start, "end": end, "text": text.strip()}
+
+
+# openai-whisper in fp32, as voicetotext has always used
+class WhisperBackend:
+    name = "whisper"
+
+    def __init__(self, model='base', device=None):
+        self.model = get_model(model, device)
+
+    @staticmethod
+    def variant(device=None):
+        # Where and at what precision results come from, for the transcription cache key;
+        # openai-whisper decodes in fp16 on CUDA by default
+        device = device or default_device()
+        return {"device": device, "quantize": "fp16" if device == "cuda" else "fp32"}
+
+    def run(self, audio, **kwargs):
+        result = self.model.transcribe(load_audio(audio), **kwargs)
+        return {
+            "text": result["text"].strip(),
+            "segments": [segment_dict(s["start"], s["end"], s["text"]) for s in result["segments"]],
+        }
+
+    def transcribe(self, audio, **kwargs):
+        return self.run(audio, **kwargs)["text"]
+
+
+# HF Whisper with every nn.Linear dynamically quantized to int8 (CPU only).
+# openai-whisper's own Linear subclass is not accepted by quantize_dynamic, hence the HF model.
+class HFInt8Backend:
+    name = "hf-int8"
+
+    def __init__(self, model="openai/whisper-base", device=None):
+        import whisper
+        from voice_to_text import inference
+        if model in whisper.available_models():
+            model = f"openai/whisper-{model}"
+        # model_fn places the pipeline itself (and only quantizes on CPU), so key on where it lands
+        self.pipeline = registry.get(("hf-int8", model, inference.DEVICE), lambda: inference.model_fn(model, quantize="int8"))
+
+    @staticmethod
+    def variant(device=None):
+        # model_fn ignores `device` and only quantizes when there is no CUDA
+        device = default_device()
+        return {"device": device, "quantize": "int8" if device == "cpu" else "none"}
+
+    def run(self, audio, **kwargs):
+        result = self.pipeline({"raw": load_audio(audio), "sampling_rate": SAMPLE_RATE},
+                               return_timestamps=True, **kwargs)
+        return {
+            "text": result["text"].strip(),
+            "segments": [segment_dict(*c["timestamp"], c["text"]) for c in result.get("chunks", [])],
+        }
+
+    def transcribe(self, audio, **kwargs):
+        return self.pipeline({"raw": load_audio(audio), "sampling_rate": SAMPLE_RATE}, **kwargs)["text"].strip()
+
+
+# CTranslate2 engine through faster-whisper, int8 on CPU. `model` is either a size name or a
+# directory written by `artifacts.py --ct2_directory`.
+class FasterWhisperBackend:
+    name = "faster-whisper"
+
+    def __init__(self, model='base', device=None, compute_type="int8"):
+        device = device or default_device()
+        self.model = registry.get(("faster-whisper", model, device, compute_type),
+                                  lambda: _load_faster_whisper(model, device, compute_type))
+
+    @staticmethod
+    def variant(device=None, compute_type="int8"):
+        return {"device": device or default_device(), "quantize": compute_type}
+
+    def run(self, audio, **kwargs):
+        segments, _ = self.model.transcribe(load_audio(audio), **kwargs)
+        segments = list(segments)
+        # Raw segment texts keep their leading space, as in openai-whisper's full text
+        return {
+            "text": "".join(s.text for s in segments).strip(),
+            "segments": [segment_dict(s.start, s.end, s.text) for s in segments],
+        }
+
+    def transcribe(self, audio, **kwargs):
+        return self.run(audio, **kwargs)["text"]
+
+
+def _load_faster_whisper(model, device, compute_type):
+    import torch
+    try:
+        from faster_whisper import WhisperModel
+    except ImportError as e:
+        raise ImportError("The faster-whisper backend needs `pip install faster-whisper`") from e
+    return WhisperModel(model, device=device, compute_type=compute_type,
+                        cpu_threads=torch.get_num_threads())
+
+
+# Every backend has run() -> {"text", "segments"} and transcribe() -> text
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    HFInt8Backend.name: HFInt8Backend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def resolve_backend_name(name=None):
+    name = name or backend_name
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown ASR backend {name!r}; expected one of {sorted(BACKENDS)}")
+    return name
+
+
+def get_backend(name=None, model=None, device=None):
+    cls = BACKENDS[resolve_backend_name(name)]
+    return cls(model, device) if model else cls(device=device)
@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from voice_to_text import inference
+from voice_to_text.audio_io import load_audio
+
+SAMPLE_RATE = 16000
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".m4a", ".ogg")
+
+
+def list_audio(directory):
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(AUDIO_EXTENSIONS)
+    )
+
+
+def load_input(path):
+    audio = load_audio(path, SAMPLE_RATE)
+    return path, {"raw": audio, "sampling_rate": SAMPLE_RATE}
+
+
+def audio_seconds(inp):
+    return len(inp["raw"]) / SAMPLE_RATE
+
+
+def decoded_groups(paths, group_size, workers):
+    # Decoding runs on a bounded pool, at most `workers` groups ahead of the model
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for i in range(0, len(paths), group_size):
+            pending.append([pool.submit(load_input, p) for p in paths[i:i + group_size]])
+            if len(pending) > workers:
+                yield [f.result() for f in pending.pop(0)]
+        for group in pending:
+            yield [f.result() for f in group]
+
+
+def transcribe_paths(paths, model, out, batch_size=None, workers=4):
+    # Each group of files goes through predict_fn as one list; results are written as soon as their group finishes
+    batch_size = batch_size or inference.batch_size
+    group_size = max(batch_size, 1)
+    total_audio = 0.0
+    start = time.perf_counter()
+    for group in decoded_groups(paths, group_size, workers):
+        # The pipeline pops "raw" from each input, so measure durations first
+        durations = [audio_seconds(inp) for _, inp in group]
+        group_start = time.perf_counter()
+        outputs = inference.predict_fn([inp for _, inp in group], model, batch_size)
+        elapsed = time.perf_counter() - group_start
+        for (path, _), audio_s, output in zip(group, durations, outputs):
+            total_audio += audio_s
+            out.write(json.dumps({
+                "file": path,
+                "text": output["text"].strip(),
+                "audio_s": round(audio_s, 3),
+                "batch_elapsed_s": round(elapsed, 3),
+            }) + "\n")
+        out.flush()
+    wall = time.perf_counter() - start
+    return total_audio, wall
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory")
+    parser.add_argument("--model_dir", default="./whisper_model")
+    parser.add_argument("--out_jsonl", default="-")
+    parser.add_argument("--batch_size", type=int, default=inference.batch_size)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    paths = list_audio(args.directory)
+    model = inference.model_fn(args.model_dir)
+    out = sys.stdout if args.out_jsonl == "-" else open(args.out_jsonl, "w")
+    try:
+        audio_s, wall_s = transcribe_paths(paths, model, out, args.batch_size, args.workers)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{len(paths)} files, {audio_s:.1f}s audio in {wall_s:.1f}s "
+          f"({audio_s / wall_s if wall_s else 0:.2f} audio-s per wall-s)", file=sys.stderr)
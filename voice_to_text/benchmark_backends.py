@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from voice_to_text.backends import BACKENDS, SAMPLE_RATE, get_backend, load_audio
+from voice_to_text.voicetotext import AUDIO_DIR
+
+DEFAULT_FILES = [os.path.join(AUDIO_DIR, "sound1.wav"), os.path.join(AUDIO_DIR, "LJ037-0171.wav")]
+
+
+def normalize(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    if not ref:
+        return float(bool(hyp))
+    # Levenshtein distance over words, one DP row at a time
+    row = np.arange(len(hyp) + 1)
+    for i, word in enumerate(ref, 1):
+        prev, row = row, np.empty_like(row)
+        row[0] = i
+        for j, h in enumerate(hyp, 1):
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + (word != h))
+    return row[-1] / len(ref)
+
+
+def run(files, backends, model, references, repeats):
+    audio = {path: load_audio(path) for path in files}
+    results = []
+    for name in backends:
+        load_start = time.perf_counter()
+        backend = get_backend(name, model)
+        load_s = time.perf_counter() - load_start
+        backend.transcribe(audio[files[0]])  # warm-up
+
+        for path in files:
+            duration = len(audio[path]) / SAMPLE_RATE
+            start = time.perf_counter()
+            for _ in range(repeats):
+                text = backend.transcribe(audio[path])
+            wall = (time.perf_counter() - start) / repeats
+            results.append({"backend": name, "file": os.path.basename(path), "load_s": load_s,
+                            "rtf": wall / duration, "text": text})
+
+    # WER is only reported against real transcripts; agreement with fp32 openai-whisper is shown
+    # separately as drift, which says nothing about accuracy on its own
+    baseline = {r["file"]: r["text"] for r in results if r["backend"] == "whisper"}
+    references = references or {}
+    print("| Backend | File | Load (s) | RTF | WER | Drift vs fp32 whisper |")
+    print("|---|---|---|---|---|---|")
+    for r in results:
+        ref, fp32 = references.get(r["file"]), baseline.get(r["file"])
+        wer = f"{word_error_rate(ref, r['text']):.3f}" if ref is not None else "n/a"
+        drift = f"{word_error_rate(fp32, r['text']):.3f}" if fp32 is not None else "n/a"
+        print(f"| {r['backend']} | {r['file']} | {r['load_s']:.2f} | {r['rtf']:.3f} | {wer} | {drift} |")
+    return results
+
+
+def load_references(path):
+    # Either a JSON object {file name: transcript}, or LJSpeech's metadata.csv
+    # ("LJ037-0171|raw text|normalized text"), scored against the normalized text
+    if path.endswith(".json"):
+        with open(path) as f:
+            return json.load(f)
+    references = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("|")
+            if len(fields) >= 2:
+                references[fields[0] + ".wav"] = fields[-1]
+    return references
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", default=DEFAULT_FILES)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--references", default=None,
+                        help="JSON mapping file name to transcript, or LJSpeech's metadata.csv for LJ037-0171.wav")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    references = load_references(args.references) if args.references else None
+    run(args.files, args.backends, args.model, references, args.repeats)
@@ -0,0 +1,39 @@
+import argparse
+import os
+import time
+
+from voice_to_text import inference
+from voice_to_text.batch_transcribe import audio_seconds, load_input
+from voice_to_text.voicetotext import AUDIO_DIR
+
+DEFAULT_FILES = [os.path.join(AUDIO_DIR, "sound1.wav"), os.path.join(AUDIO_DIR, "LJ037-0171.wav")]
+
+
+def run(files, model_dir, batch_sizes, copies):
+    model = inference.model_fn(model_dir)
+    inputs = [load_input(path)[1] for path in files] * copies
+    audio_s = sum(audio_seconds(inp) for inp in inputs)
+
+    # Warm-up so the first measured batch size does not pay one-off allocation costs
+    inference.predict_fn([dict(inputs[0])], model)
+
+    print(f"{len(inputs)} inputs, {audio_s:.1f}s of audio, device={inference.DEVICE}\n")
+    print("| Batch size | Wall (s) | Audio-s per wall-s |")
+    print("|---|---|---|")
+    for size in batch_sizes:
+        start = time.perf_counter()
+        # Copies, since the pipeline consumes the input dicts
+        inference.predict_fn([dict(inp) for inp in inputs], model, size)
+        wall = time.perf_counter() - start
+        print(f"| {size} | {wall:.2f} | {audio_s / wall:.2f} |")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", default=DEFAULT_FILES)
+    parser.add_argument("--model_dir", default="openai/whisper-base")
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--copies", type=int, default=8)
+    args = parser.parse_args()
+
+    run(args.files, args.model_dir, args.batch_sizes, args.copies)
@@ -0,0 +1,52 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from voice_to_text.voicetotext import AUDIO_DIR
+
+# Runs in a fresh interpreter; reports when model_fn returned and when the first transcript was ready
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+from voice_to_text import inference
+from voice_to_text.audio_io import load_audio
+t_import = time.perf_counter()
+model = inference.model_fn(sys.argv[1])
+t_model_fn = time.perf_counter()
+inference.predict_fn({"raw": load_audio(sys.argv[2]), "sampling_rate": 16000}, model)
+t_first = time.perf_counter()
+print(json.dumps({"import": t_import - t0, "model_fn": t_model_fn - t_import, "first": t_first - t_model_fn}))
+"""
+
+
+def cold_start(model_dir, audio_path):
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", CHILD, model_dir, audio_path],
+                         capture_output=True, text=True, check=True, cwd=os.path.dirname(AUDIO_DIR))
+    total = time.perf_counter() - start
+    return total, json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run(model_dirs, audio_path, repeats):
+    print("| Model dir | Bundle runtime | Imports (s) | model_fn (s) | First transcription (s) | Process start to text (s) |")
+    print("|---|---|---|---|---|---|")
+    from voice_to_text.inference import quantize, read_manifest, use_onnx
+    for model_dir in model_dirs:
+        runtime = "onnx" if use_onnx(model_dir, quantize) else "torch" if read_manifest(model_dir) else "-"
+        for _ in range(repeats):
+            total, parts = cold_start(model_dir, audio_path)
+            print(f"| {model_dir} | {runtime} | {parts['import']:.2f} | {parts['model_fn']:.2f} "
+                  f"| {parts['first']:.2f} | {total:.2f} |")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model_dirs", nargs="+", help="e.g. ./whisper_model ./whisper_bundle")
+    parser.add_argument("--audio", default=os.path.join(AUDIO_DIR, "LJ037-0171.wav"))
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    run(args.model_dirs, args.audio, args.repeats)
@@ -0,0 +1,42 @@
+import argparse
+import os
+import time
+
+import whisper
+
+from voice_to_text import audio_io
+from voice_to_text.voicetotext import AUDIO_DIR
+
+DEFAULT_FILES = [os.path.join(AUDIO_DIR, "sound1.wav"), os.path.join(AUDIO_DIR, "LJ037-0171.wav")]
+
+
+def time_decode(load, path, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        load(path)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def run(files, repeats):
+    decoders = {
+        "ffmpeg (whisper.load_audio)": whisper.load_audio,
+        "in-process (audio_io.load_audio)": audio_io.load_audio,
+    }
+    print("| File | Decoder | ms per file |")
+    print("|---|---|---|")
+    for path in files:
+        for name, load in decoders.items():
+            try:
+                ms = f"{time_decode(load, path, repeats):.2f}"
+            except (OSError, RuntimeError) as e:
+                ms = f"n/a ({type(e).__name__})"
+            print(f"| {os.path.basename(path)} | {name} | {ms} |")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", default=DEFAULT_FILES)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    run(args.files, args.repeats)
@@ -0,0 +1,42 @@
+import argparse
+import os
+import time
+
+from voice_to_text.model_registry import get_model, registry
+from voice_to_text.voicetotext import AUDIO_DIR
+
+DEFAULT_FILES = [os.path.join(AUDIO_DIR, "sound1.wav"), os.path.join(AUDIO_DIR, "LJ037-0171.wav")]
+
+
+def timed_transcribe(path, model_size, device):
+    start = time.perf_counter()
+    model = get_model(model_size, device)
+    loaded = time.perf_counter()
+    model.transcribe(path)
+    end = time.perf_counter()
+    return loaded - start, end - loaded
+
+
+def run(files, model_size, device, repeats):
+    print("| File | Mode | Load (s) | Transcribe (s) | Total (s) |")
+    print("|---|---|---|---|---|")
+    for path in files:
+        # Cold: the model has to be loaded for this file, as transcribe_audio used to do every call
+        registry.clear()
+        load_s, run_s = timed_transcribe(path, model_size, device)
+        print(f"| {os.path.basename(path)} | cold | {load_s:.3f} | {run_s:.3f} | {load_s + run_s:.3f} |")
+
+        for _ in range(repeats):
+            load_s, run_s = timed_transcribe(path, model_size, device)
+            print(f"| {os.path.basename(path)} | warm | {load_s:.3f} | {run_s:.3f} | {load_s + run_s:.3f} |")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", default=DEFAULT_FILES)
+    parser.add_argument("--model_size", default="base")
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    run(args.files, args.model_size, args.device, args.repeats)
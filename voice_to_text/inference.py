@@ -1,18 +1,107 @@
+import json
 import os
+import threading
 import torch
 from transformers import pipeline
 
 DEVICE = "cuda:0" if torch.cuda.is_available() else "cpu"
 chunk_length_s = int(os.environ.get('chunk_length_s', 30))
+batch_size = int(os.environ.get('batch_size', 8))
+# "int8" dynamically quantizes the Linear layers when running on CPU
+quantize = os.environ.get('quantize', 'none')
+# "auto" serves a bundle's ONNX graphs when it has them and optimum is installed, "torch" always
+# uses the safetensors weights
+runtime = os.environ.get('runtime', 'auto')
+# Written by `artifacts.py --bundle_directory`; its presence marks a startup-optimized bundle
+MANIFEST = "asr_manifest.json"
 
-def model_fn(model_dir):
+def quantize_int8(model):
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def read_manifest(model_dir):
+    path = os.path.join(model_dir, MANIFEST)
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def build_onnx_pipeline(model_dir):
+    # Pre-exported encoder/decoder graphs from `artifacts.py --bundle_directory`
+    from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+    from transformers import WhisperProcessor
+    provider = "CUDAExecutionProvider" if torch.cuda.is_available() else "CPUExecutionProvider"
+    model = ORTModelForSpeechSeq2Seq.from_pretrained(model_dir, provider=provider)
+    processor = WhisperProcessor.from_pretrained(model_dir)
+    return pipeline(
+        "automatic-speech-recognition",
+        model=model,
+        tokenizer=processor.tokenizer,
+        feature_extractor=processor.feature_extractor,
+        chunk_length_s=chunk_length_s,
+    )
+
+def use_onnx(model_dir, quantize):
+    # The torch int8 path does not apply to ONNX Runtime sessions, so int8 keeps the weights
+    manifest = read_manifest(model_dir)
+    if runtime == "torch" or quantize == "int8" or not (manifest and manifest.get("graphs")):
+        return False
+    try:
+        import optimum.onnxruntime
+    except ImportError:
+        return False
+    return True
+
+def build_pipeline(model_dir, quantize=quantize):
+    if use_onnx(model_dir, quantize):
+        return build_onnx_pipeline(model_dir)
     asr_pipeline = pipeline(
         "automatic-speech-recognition",
         model=model_dir,
         chunk_length_s=chunk_length_s,
         device=0 if torch.cuda.is_available() else -1
     )
+    if quantize == "int8" and not torch.cuda.is_available():
+        asr_pipeline.model = quantize_int8(asr_pipeline.model)
     return asr_pipeline
 
-def predict_fn(input_data, model):
+def is_bundle(model_dir):
+    return os.path.isfile(os.path.join(model_dir, MANIFEST))
+
+class LazyPipeline:
+    # Loads the bundle on a background thread so model_fn returns immediately and the
+    # container can finish starting; the first call waits for the load if it is still running.
+    def __init__(self, model_dir, quantize=quantize):
+        self.model_dir = model_dir
+        self.quantize = quantize
+        self._pipeline = None
+        self._error = None
+        self._thread = threading.Thread(target=self._load, daemon=True)
+        self._thread.start()
+
+    def _load(self):
+        try:
+            self._pipeline = build_pipeline(self.model_dir, self.quantize)
+        except BaseException as e:
+            self._error = e
+
+    @property
+    def pipeline(self):
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._pipeline
+
+    def __call__(self, *args, **kwargs):
+        return self.pipeline(*args, **kwargs)
+
+def model_fn(model_dir, quantize=quantize):
+    if is_bundle(model_dir):
+        return LazyPipeline(model_dir, quantize)
+    return build_pipeline(model_dir, quantize)
+
+def predict_fn(input_data, model, batch_size=batch_size):
+    # A list is run as one stream: the pipeline splits every input into chunk_length_s
+    # windows and batches those chunks across inputs, so short files share batches.
+    if isinstance(input_data, list):
+        return model(input_data, batch_size=batch_size)
     return model(input_data)
@@ -0,0 +1,82 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# 0 / unset means keep every model that has been loaded
+max_models = int(os.environ.get('WHISPER_MAX_MODELS', 0)) or None
+
+
+def default_device():
+    # Never MPS: whisper hits a sparse tensor error there
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+class ModelRegistry:
+    def __init__(self, max_models=None):
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, load):
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so different models can load concurrently,
+        # while concurrent requests for the same key wait for a single load.
+        with key_lock:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    return self._models[key]
+            model = load()
+            with self._lock:
+                self._models[key] = model
+                self._evict_over_limit()
+            return model
+
+    def _evict_over_limit(self):
+        while self.max_models and len(self._models) > self.max_models:
+            self._models.popitem(last=False)
+            self._release_memory()
+
+    def evict(self, key):
+        with self._lock:
+            removed = self._models.pop(key, None) is not None
+        if removed:
+            self._release_memory()
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+        self._release_memory()
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models)
+
+    @staticmethod
+    def _release_memory():
+        # Nothing to release if no model has pulled in torch yet
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+
+registry = ModelRegistry(max_models=max_models)
+
+
+def get_model(model_size='base', device=None):
+    device = device or default_device()
+    return registry.get(("whisper", model_size, device), lambda: _load_whisper(model_size, device))
+
+
+def _load_whisper(model_size, device):
+    import whisper
+    return whisper.load_model(model_size, device=device)
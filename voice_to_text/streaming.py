@@ -0,0 +1,251 @@
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from voice_to_text.audio_io import load_audio, parse_wav_header, to_mono_float32
+from voice_to_text.model_registry import get_model
+from voice_to_text.voicetotext import AUDIO_DIR
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+
+
+# Energy-based voice activity detection over a rolling buffer. Audio is fed in arbitrary
+# chunks; a segment is returned once `min_silence_s` of silence closes it or it reaches
+# `max_segment_s` (Whisper's 30 s window). Only the open segment plus `pad_s` of lead-in
+# stays in memory, and silence between segments is never handed to the model.
+class VADSegmenter:
+    def __init__(self, sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS, margin_db=12.0, floor_db=-55.0,
+                 min_speech_s=0.25, min_silence_s=0.5, pad_s=0.2, max_segment_s=30.0, noise_window_s=5.0):
+        self.sample_rate = sample_rate
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self.margin_db = margin_db
+        self.floor_db = floor_db
+        self.min_speech_frames = int(min_speech_s * 1000 / frame_ms)
+        self.min_silence_frames = int(min_silence_s * 1000 / frame_ms)
+        self.pad = int(pad_s * sample_rate)
+        self.max_segment = int(max_segment_s * sample_rate)
+        self.noise_window = int(noise_window_s * 1000 / frame_ms)
+
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.offset = 0           # absolute sample index of buffer[0]
+        self.scanned = 0          # absolute sample index up to which frames were classified
+        # Noise floor: minimum frame energy over the last noise_window_s, starting from the
+        # calibrated floor so a recording that opens with speech is not taken as silence
+        self.noise_db = floor_db - margin_db
+        self.recent_db = deque(maxlen=self.noise_window)
+        self.speech_start = None  # absolute sample index, None while silent
+        self.speech_frames = 0
+        self.silent_frames = 0
+        self.last_end = 0         # absolute end of the last emitted segment, so padding never overlaps it
+
+    def _frame_db(self, frames):
+        rms = np.sqrt(np.mean(frames ** 2, axis=1) + 1e-12)
+        return 20 * np.log10(rms)
+
+    def _track_noise(self, db):
+        # Drops to a quieter frame at once; rises only after a full window without one, and then
+        # only to the quietest frame in it (the gaps between words), never to the speech level
+        self.recent_db.append(db)
+        if len(self.recent_db) == self.noise_window:
+            self.noise_db = min(self.recent_db)
+        else:
+            self.noise_db = min(self.noise_db, db)
+
+    def _segment(self, start, end, pad_end):
+        lo = max(start - self.pad, self.offset, self.last_end)
+        hi = min(end + self.pad if pad_end else end, self.offset + len(self.buffer))
+        self.last_end = hi
+        return lo, hi, self.buffer[lo - self.offset:hi - self.offset].copy()
+
+    def _close(self, end, pad_end=True):
+        segment = None
+        if self.speech_frames >= self.min_speech_frames:
+            segment = self._segment(self.speech_start, end, pad_end)
+        self.speech_start = None
+        self.speech_frames = 0
+        self.silent_frames = 0
+        return segment
+
+    def _trim(self):
+        # Keep the open segment (or a short lead-in while silent) and drop the rest
+        keep_from = self.scanned - self.pad if self.speech_start is None else self.speech_start - self.pad
+        keep_from = max(keep_from, self.offset)
+        self.buffer = self.buffer[keep_from - self.offset:]
+        self.offset = keep_from
+
+    def feed(self, chunk):
+        self.buffer = np.concatenate([self.buffer, np.asarray(chunk, dtype=np.float32)])
+        start = self.scanned - self.offset
+        n = (len(self.buffer) - start) // self.frame_len
+        if n == 0:
+            return []
+
+        frames = self.buffer[start:start + n * self.frame_len].reshape(n, self.frame_len)
+        energies = self._frame_db(frames)
+
+        segments = []
+        for i, db in enumerate(energies):
+            frame_start = self.scanned + i * self.frame_len
+            frame_end = frame_start + self.frame_len
+            self._track_noise(float(db))
+            is_speech = db > max(self.noise_db + self.margin_db, self.floor_db)
+
+            if is_speech:
+                if self.speech_start is None:
+                    self.speech_start = frame_start
+                self.speech_frames += 1
+                self.silent_frames = 0
+            else:
+                if self.speech_start is not None:
+                    self.silent_frames += 1
+                    if self.silent_frames >= self.min_silence_frames:
+                        segment = self._close(frame_end - self.silent_frames * self.frame_len)
+                        if segment:
+                            segments.append(segment)
+
+            if self.speech_start is not None and frame_end - self.speech_start + self.pad + self.frame_len > self.max_segment:
+                segment = self._close(frame_end, pad_end=False)
+                if segment:
+                    segments.append(segment)
+
+        self.scanned += n * self.frame_len
+        self._trim()
+        return segments
+
+    def flush(self):
+        if self.speech_start is None:
+            return []
+        segment = self._close(self.scanned - self.silent_frames * self.frame_len)
+        return [segment] if segment else []
+
+
+def whisper_segment_fn(model_size='base', device=None):
+    model = get_model(model_size, device)
+
+    def transcribe(audio, prompt):
+        return model.transcribe(audio, initial_prompt=prompt or None)["text"].strip()
+
+    return transcribe
+
+
+def pipeline_segment_fn(asr_pipeline):
+    # For the HF pipeline from inference.model_fn; segments are already <= 30 s
+    def transcribe(audio, prompt):
+        return asr_pipeline({"raw": audio, "sampling_rate": SAMPLE_RATE})["text"].strip()
+
+    return transcribe
+
+
+# Incremental WAV decoder for uploads that arrive in arbitrary byte chunks: parses the RIFF
+# header once, then turns PCM16/float32 frames into 16 kHz mono float32 as they come in.
+# Resampling is linear interpolation carried across chunks, which is enough for ASR.
+class WavStreamDecoder:
+    def __init__(self, target_rate=SAMPLE_RATE):
+        self.target_rate = target_rate
+        self.pending = b""
+        self.header_done = False
+        self.channels = self.sample_rate = self.dtype = None
+        self.consumed = 0    # input samples seen so far
+        self.emitted = 0     # output samples produced so far
+        self.last = None     # last input sample of the previous chunk, for interpolation
+
+    def _parse_header(self):
+        layout = parse_wav_header(self.pending)
+        if layout is None:
+            return False
+        self.channels, self.sample_rate, self.dtype = layout["channels"], layout["sample_rate"], layout["dtype"]
+        self.pending = self.pending[layout["data_offset"]:]
+        self.header_done = True
+        return True
+
+    def _resample(self, audio):
+        if self.sample_rate == self.target_rate or len(audio) == 0:
+            return audio
+        # Output sample n sits at input position n * step; the previous chunk's last sample
+        # is carried over so positions between chunks can still be interpolated
+        step = self.sample_rate / self.target_rate
+        buf = audio if self.last is None else np.concatenate([[self.last], audio])
+        base = self.consumed - (len(buf) - len(audio))
+        end = base + len(buf) - 1
+        count = max(int(np.ceil(end / step)) - self.emitted, 0)
+        positions = (self.emitted + np.arange(count)) * step
+        out = np.interp(positions - base, np.arange(len(buf)), buf).astype(np.float32)
+        self.emitted += count
+        self.consumed += len(audio)
+        self.last = buf[-1]
+        return out
+
+    def feed(self, data):
+        self.pending += data
+        if not self.header_done and not self._parse_header():
+            return np.zeros(0, dtype=np.float32)
+        frame_bytes = self.dtype.itemsize * self.channels
+        usable = len(self.pending) - len(self.pending) % frame_bytes
+        raw, self.pending = self.pending[:usable], self.pending[usable:]
+        frames = np.frombuffer(raw, dtype=self.dtype).reshape(-1, self.channels)
+        return self._resample(to_mono_float32(frames, self.dtype))
+
+
+# Feeds live audio through the VAD and transcribes each segment as soon as it closes
+class StreamingTranscriber:
+    def __init__(self, transcribe_fn=None, model_size='base', device=None, **vad_kwargs):
+        self.transcribe_fn = transcribe_fn or whisper_segment_fn(model_size, device)
+        self.vad = VADSegmenter(**vad_kwargs)
+        self.texts = []
+        self.decoded_samples = 0
+
+    def _decode(self, segments):
+        results = []
+        for start, end, audio in segments:
+            text = self.transcribe_fn(audio, self.texts[-1] if self.texts else None)
+            self.decoded_samples += len(audio)
+            if text:
+                self.texts.append(text)
+            results.append({
+                "start": start / self.vad.sample_rate,
+                "end": end / self.vad.sample_rate,
+                "text": text,
+                "transcript": " ".join(self.texts),
+            })
+        return results
+
+    def feed(self, chunk):
+        return self._decode(self.vad.feed(chunk))
+
+    def flush(self):
+        return self._decode(self.vad.flush())
+
+    @property
+    def decoded_seconds(self):
+        return self.decoded_samples / self.vad.sample_rate
+
+
+def stream_transcribe(audio_path, model_size='base', device=None, chunk_s=1.0, transcribe_fn=None, **vad_kwargs):
+    # One partial result per speech segment, yielded while the rest of the file is still pending
+    audio = load_audio(audio_path)
+    transcriber = StreamingTranscriber(transcribe_fn, model_size, device, **vad_kwargs)
+    step = int(chunk_s * SAMPLE_RATE)
+    for i in range(0, len(audio), step):
+        yield from transcriber.feed(audio[i:i + step])
+    yield from transcriber.flush()
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(AUDIO_DIR, "sound1.wav")
+    start = time.perf_counter()
+    first = None
+    total_s = len(load_audio(path)) / SAMPLE_RATE
+    decoded = 0.0
+    for part in stream_transcribe(path):
+        if first is None:
+            first = time.perf_counter() - start
+        decoded += part["end"] - part["start"]
+        print(f"[{part['start']:7.2f} - {part['end']:7.2f}] {part['text']}")
+
+    print(f"\nTime to first text: {first if first is not None else float('nan'):.2f}s")
+    print(f"Total time:         {time.perf_counter() - start:.2f}s")
+    print(f"Decoded audio:      {decoded:.1f}s of {total_s:.1f}s")
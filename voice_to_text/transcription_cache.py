@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+cache_dir = os.environ.get('TRANSCRIPTION_CACHE_DIR', os.path.expanduser("~/.cache/agentic_asr/transcripts"))
+memory_entries = int(os.environ.get('TRANSCRIPTION_CACHE_ENTRIES', 256))
+
+HASH_BLOCK = 1 << 20
+
+
+def audio_digest(audio):
+    # Content hash of a file (streamed in blocks) or of an in-memory array
+    h = hashlib.sha256()
+    if isinstance(audio, str):
+        with open(audio, "rb") as f:
+            while block := f.read(HASH_BLOCK):
+                h.update(block)
+        return h.hexdigest(), os.path.getsize(audio)
+    audio = np.ascontiguousarray(audio)
+    h.update(audio.dtype.str.encode())
+    h.update(audio.tobytes())
+    return h.hexdigest(), audio.nbytes
+
+
+def cache_key(digest, backend, model, params, variant=None):
+    # variant: device and quantization, so CPU-int8 and CUDA-fp32 transcripts are never mixed up
+    spec = json.dumps({"audio": digest, "backend": backend, "model": model, "params": params, "variant": variant},
+                      sort_keys=True, default=str)
+    return hashlib.sha256(spec.encode()).hexdigest()
+
+
+# Two tiers: an in-memory LRU in front of one JSON file per key on disk.
+# A hit returns {"text", "segments"} without touching the backend, so no model is loaded.
+class TranscriptionCache:
+    def __init__(self, directory=cache_dir, max_entries=memory_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key], "memory"
+        path = self._path(key)
+        if self.directory and os.path.exists(path):
+            with open(path) as f:
+                result = json.load(f)
+            with self._lock:
+                self._remember(key, result)
+            return result, "disk"
+        return None, None
+
+    def put(self, key, result):
+        with self._lock:
+            self._remember(key, result)
+        if not self.directory:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so a concurrent reader never sees a partial file
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp, path)
+
+    def get_or_transcribe(self, audio, backend, model, params, transcribe, variant=None):
+        digest, size = audio_digest(audio)
+        key = cache_key(digest, backend, model, params, variant)
+        result, tier = self.get(key)
+        with self._lock:
+            if tier == "memory":
+                self.memory_hits += 1
+            elif tier == "disk":
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+            if tier:
+                self.bytes_saved += size
+        if result is None:
+            result = transcribe()
+            self.put(key, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "lookups": lookups,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+            }
+
+
+cache = TranscriptionCache()
@@ -1,20 +1,37 @@
-import whisper
-import torch
+import os
+from voice_to_text.backends import BACKENDS, get_backend, resolve_backend_name
+from voice_to_text.transcription_cache import cache
 
-def transcribe_audio(audio_path, model_size='base'):
-    # Don't send the model to MPS to avoid sparse tensor error
-    print("Loading model on CPU to avoid sparse tensor error on MPS...")
+AUDIO_DIR = os.path.dirname(os.path.abspath(__file__))
 
-    model = whisper.load_model(model_size)  # keep on CPU
-    result = model.transcribe(audio_path)
+
+def transcribe_result(audio_path, model_size='base', device=None, backend=None, use_cache=True, **params):
+    # {"text", "segments"}; repeated audio is served from the content-hash cache without loading a model
+    backend = resolve_backend_name(backend)
+
+    def run():
+        return get_backend(backend, model_size, device).run(audio_path, **params)
+
+    if not use_cache:
+        return run()
+    return cache.get_or_transcribe(audio_path, backend, model_size, params, run, BACKENDS[backend].variant(device))
+
+
+def transcribe_audio(audio_path, model_size='base', device=None, backend=None, use_cache=True):
+    # Backend defaults to ASR_BACKEND (openai-whisper unless set); models come from the
+    # process-wide registry, so only the first call per backend/size/device pays the load
+    text = transcribe_result(audio_path, model_size, device, backend, use_cache)["text"]
 
     print("\n--- Transcribed Text ---\n")
-    print(result["text"])
-    return result["text"]
+    print(text)
+    return text
 
 if __name__ == "__main__":
-    wav_file = "sound1.wav"  # replace with your WAV filename
+    wav_file = os.path.join(AUDIO_DIR, "sound1.wav")  # replace with your WAV filename
     transcribe_audio(wav_file, model_size='base')
-    wav_file2 = "LJ037-0171.wav"  # replace with your WAV filename
+    wav_file2 = os.path.join(AUDIO_DIR, "LJ037-0171.wav")  # replace with your WAV filename
     transcribe_audio(wav_file2, model_size='base')
 
+    stats = cache.stats()
+    print(f"\nTranscription cache: {stats['hit_rate']:.0%} hit rate over {stats['lookups']} lookups, "
+          f"{stats['bytes_saved']} audio bytes not re-transcribed")